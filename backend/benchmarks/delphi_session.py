@@ -0,0 +1,319 @@
+"""Load test: a live Delphi session, end to end over HTTP and WebSockets.
+
+Boots the app under uvicorn (--workers of them) and a fake OpenRouter
+(benchmarks/fake_openrouter.py, with --llm-latency), then simulates a
+session:
+
+- --participants people register, log in, unlock the form with its join
+  code, and hold a /ws connection for it;
+- each polls active_round and has_submitted every --poll-interval seconds
+  and submits once per round, after a random think time;
+- the admin, every --round-seconds, runs generate_summary, pushes the
+  result (which is broadcast to every socket) and opens the next round,
+  for --rounds rounds.
+
+Reports throughput and p50/p99 latency per endpoint, and how long pushed
+summaries took to reach the participants' sockets.
+
+Run from backend/, with requirements-dev.txt installed (for httpx and
+websockets):
+
+    python benchmarks/delphi_session.py --participants 200 --rounds 3
+    DATABASE_URL=postgresql://... python benchmarks/delphi_session.py --workers 4
+
+DATABASE_URL defaults to a throwaway SQLite file. BCRYPT_ROUNDS defaults to
+4 here, so that registration doesn't dominate the run. --url drives an
+already running server instead (with --admin-email/--admin-password, and
+its own LLM configuration).
+
+The simulated clients all run in this one process, alongside the servers
+it boots; on a machine with few cores they compete for CPU with the app.
+For capacity numbers, run the app elsewhere and point --url at it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+import websockets
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, method: str, name: str, url: str, **kwargs):
+        # `name` is the route template, so results group per endpoint. Failed
+        # requests (status >= 400, or no response at all, returned as None)
+        # count as errors; only answered ones count towards latency.
+        start = time.perf_counter()
+        try:
+            r = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        if r.status_code >= 400:
+            self.errors[name] += 1
+        return r
+
+
+class Session:
+    def __init__(self, args, client: httpx.AsyncClient, ws_url: str):
+        self.args = args
+        self.client = client
+        self.ws_url = ws_url
+        self.rec = Recorder()
+        self.stop = asyncio.Event()
+        # summary text -> when the admin started pushing it
+        self.pushed: dict[str, float] = {}
+        self.deliveries = defaultdict(list)
+        self.sockets = 0
+
+    async def admin_headers(self):
+        r = await self.client.post("/login", data={
+            "username": self.args.admin_email, "password": self.args.admin_password})
+        r.raise_for_status()
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    async def create_form(self, admin):
+        self.join_code = f"bench-{os.urandom(4).hex()}"
+        r = await self.client.post("/create_form", headers=admin, json={
+            "title": "Load test session",
+            "questions": [f"Question {i + 1}?" for i in range(self.args.questions)],
+            "allow_join": True,
+            "join_code": self.join_code,
+        })
+        r.raise_for_status()
+        return r.json()["id"]
+
+    async def join(self, email: str, gate: asyncio.Semaphore):
+        async with gate:
+            await self.rec.request(self.client, "POST", "/register", "/register",
+                                   data={"email": email, "password": "pw"})
+            r = await self.rec.request(self.client, "POST", "/login", "/login",
+                                       data={"username": email, "password": "pw"})
+            if r is None or r.status_code != 200:
+                return None
+            headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+            r = await self.rec.request(self.client, "POST", "/forms/unlock", "/forms/unlock",
+                                       headers=headers, json={"join_code": self.join_code})
+            return headers if r is not None and r.status_code == 200 else None
+
+    async def listen(self, form_id: int, connected: asyncio.Event):
+        async with websockets.connect(f"{self.ws_url}/ws?form_id={form_id}", open_timeout=30) as ws:
+            self.sockets += 1
+            connected.set()
+            while not self.stop.is_set():
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), 0.5)
+                except asyncio.TimeoutError:
+                    continue
+                received = time.perf_counter()
+                message = json.loads(raw)
+                sent = self.pushed.get(message.get("summary"))
+                if sent is not None:
+                    self.deliveries[message["summary"]].append(received - sent)
+
+    async def participant(self, form_id: int, headers: dict):
+        submitted_round = None
+        answers = json.dumps({f"q{i + 1}": f"answer {i + 1}" for i in range(self.args.questions)})
+        think_until = 0.0
+        while not self.stop.is_set():
+            r = await self.rec.request(self.client, "GET", "/forms/{form_id}/active_round",
+                                       f"/forms/{form_id}/active_round", headers=headers)
+            round_id = r.json().get("id") if r is not None and r.status_code == 200 else None
+            if round_id is not None and round_id != submitted_round:
+                if not think_until:
+                    think_until = time.perf_counter() + random.uniform(0, self.args.round_seconds / 2)
+                r = await self.rec.request(self.client, "GET", "/has_submitted", "/has_submitted",
+                                           headers=headers, params={"form_id": form_id})
+                if r is not None and r.status_code == 200 and r.json().get("submitted"):
+                    submitted_round, think_until = round_id, 0.0
+                elif time.perf_counter() >= think_until:
+                    r = await self.rec.request(self.client, "POST", "/submit", "/submit",
+                                               headers=headers, data={"form_id": form_id, "answers": answers})
+                    if r is not None and r.status_code == 200:
+                        submitted_round, think_until = round_id, 0.0
+            await asyncio.sleep(self.args.poll_interval * random.uniform(0.8, 1.2))
+
+    async def admin(self, form_id: int, headers: dict):
+        for n in range(self.args.rounds):
+            await asyncio.sleep(self.args.round_seconds)
+            r = await self.rec.request(self.client, "POST", "/forms/{form_id}/generate_summary",
+                                       f"/forms/{form_id}/generate_summary", headers=headers,
+                                       json={"model": self.args.model, "force": True})
+            summary = (r.json().get("summary") if r is not None and r.status_code == 200 else None) or "No summary"
+            # Unique per round, so sockets can tell which push they received.
+            summary = f"{summary}\n\n(round {n + 1}, {os.urandom(4).hex()})"
+            self.pushed[summary] = time.perf_counter()
+            await self.rec.request(self.client, "POST", "/forms/{form_id}/push_summary",
+                                   f"/forms/{form_id}/push_summary", headers=headers, json={"summary": summary})
+            if n + 1 < self.args.rounds:
+                await self.rec.request(self.client, "POST", "/forms/{form_id}/next_round",
+                                       f"/forms/{form_id}/next_round", headers=headers)
+        # Let the last broadcast land.
+        await asyncio.sleep(2)
+        self.stop.set()
+
+    async def run(self):
+        admin = await self.admin_headers()
+        form_id = await self.create_form(admin)
+        prefix = f"p{int(time.time())}-"
+        gate = asyncio.Semaphore(self.args.concurrency)
+
+        start = time.perf_counter()
+        participants = await asyncio.gather(*(
+            self.join(f"{prefix}{i}@bench.local", gate) for i in range(self.args.participants)
+        ))
+        joined = time.perf_counter() - start
+        # Those who failed to register, log in or unlock sit the session out.
+        participants = [h for h in participants if h is not None]
+        self.joined = len(participants)
+
+        connected = [asyncio.Event() for _ in participants]
+        listeners = [asyncio.create_task(self.listen(form_id, c)) for c in connected]
+        await asyncio.wait_for(asyncio.gather(*(c.wait() for c in connected)), 60)
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            self.admin(form_id, admin),
+            *(self.participant(form_id, h) for h in participants),
+        )
+        session = time.perf_counter() - start
+        await asyncio.gather(*listeners, return_exceptions=True)
+        return joined, session
+
+
+def wait_until_up(url: str, proc: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"{proc.args[2:4]} exited with {proc.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up within {timeout}s")
+
+
+def start_servers(args):
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/session.db")
+    env.setdefault("BCRYPT_ROUNDS", "4")
+    env["ADMIN_EMAIL"] = args.admin_email
+    env["ADMIN_PASSWORD"] = args.admin_password
+    env["OPENROUTER_API_KEY"] = "benchmark"
+    env["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{args.llm_port}/v1"
+
+    llm = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND, "benchmarks", "fake_openrouter.py"),
+         "--port", str(args.llm_port), "--latency", str(args.llm_latency), "--jitter", str(args.llm_jitter)],
+        cwd=BACKEND, env=env,
+    )
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL,
+    )
+    procs = [llm, app]
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.llm_port}/stats", llm)
+        wait_until_up(f"http://127.0.0.1:{args.port}/me", app)
+    except BaseException:
+        stop_servers(procs)
+        raise
+    print(f"database: {env['DATABASE_URL'].split('@')[-1]}  workers: {args.workers}  "
+          f"llm latency: {args.llm_latency}s")
+    return procs
+
+
+def stop_servers(procs):
+    for p in procs:
+        p.terminate()
+    for p in procs:
+        try:
+            p.wait(10)
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+
+def report(session: Session, joined: float, elapsed: float):
+    print(f"\njoined {session.joined}/{session.args.participants} participants in {joined:.2f}s; "
+          f"session ran {elapsed:.1f}s with {session.sockets} sockets")
+    print(f"{'endpoint':42} {'n':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, values in sorted(session.rec.latencies.items()):
+        window = joined if name in ("/register", "/login", "/forms/unlock") else elapsed
+        print(f"{name:42} {len(values):6} {session.rec.errors[name]:5} {len(values) / window:8.1f} "
+              f"{percentile(values, 50) * 1000:8.1f} {percentile(values, 99) * 1000:8.1f} "
+              f"{max(values) * 1000:8.1f}")
+
+    delivered = [t for times in session.deliveries.values() for t in times]
+    expected = len(session.pushed) * session.sockets
+    print(f"\nbroadcasts: {len(delivered)}/{expected} delivered")
+    if delivered:
+        print(f"delivery time: p50 {percentile(delivered, 50) * 1000:.1f}ms  "
+              f"p99 {percentile(delivered, 99) * 1000:.1f}ms  max {max(delivered) * 1000:.1f}ms  "
+              f"mean {statistics.fmean(delivered) * 1000:.1f}ms")
+
+
+async def run(args, url: str):
+    ws_url = "ws" + url[len("http"):]
+    limits = httpx.Limits(max_connections=args.participants + 10)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        session = Session(args, client, ws_url)
+        joined, elapsed = await session.run()
+    report(session, joined, elapsed)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--participants", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--round-seconds", type=float, default=10)
+    parser.add_argument("--poll-interval", type=float, default=2)
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight while joining")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--llm-port", type=int, default=8765)
+    parser.add_argument("--llm-latency", type=float, default=2)
+    parser.add_argument("--llm-jitter", type=float, default=0.5)
+    parser.add_argument("--model", default="openai/gpt-4o-mini")
+    parser.add_argument("--url", help="drive this running server instead of booting one")
+    parser.add_argument("--admin-email", default=os.getenv("ADMIN_EMAIL", "admin@example.com"))
+    parser.add_argument("--admin-password", default=os.getenv("ADMIN_PASSWORD", "change-me-now"))
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run(args, args.url.rstrip("/")))
+        return
+
+    procs = start_servers(args)
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{args.port}"))
+    finally:
+        stop_servers(procs)
+
+
+if __name__ == "__main__":
+    cli()
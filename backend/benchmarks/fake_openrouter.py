@@ -0,0 +1,112 @@
+"""A local stand-in for OpenRouter's chat completions API.
+
+Answers /v1/chat/completions after a configurable delay, streamed or not,
+with a short summary of the prompt and a usage block (tokens and cost) in
+OpenRouter's shape. Point the backend at it with
+
+    OPENROUTER_BASE_URL=http://127.0.0.1:8765/v1
+
+and run it from backend/:
+
+    python benchmarks/fake_openrouter.py --port 8765 --latency 2 --jitter 0.5
+
+--error-rate makes that fraction of calls fail with a 503, for exercising
+retries and fallbacks. GET /stats reports calls served per model.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Roughly what a mid-sized model charges, per token, in USD.
+PROMPT_PRICE = 0.000001
+COMPLETION_PRICE = 0.000004
+
+
+def _usage(prompt: str, completion: str) -> dict:
+    # ~4 characters per token, like the backend's own estimate.
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(completion) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "cost": prompt_tokens * PROMPT_PRICE + completion_tokens * COMPLETION_PRICE,
+    }
+
+
+def make_app(latency: float = 1.0, jitter: float = 0.0, error_rate: float = 0.0,
+             chunk_delay: float = 0.02, latency_by_model: dict[str, float] | None = None) -> FastAPI:
+    app = FastAPI()
+    calls = Counter()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "")
+        calls[model] += 1
+        prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+
+        mean = (latency_by_model or {}).get(model, latency)
+        await asyncio.sleep(max(0.0, random.gauss(mean, jitter)))
+        if random.random() < error_rate:
+            return JSONResponse({"error": {"message": "fake upstream error", "code": 503}}, status_code=503)
+
+        text = f"Synthesis by {model} of {len(prompt)} characters of responses."
+        usage = _usage(prompt, text)
+        base = {"id": f"gen-{time.time_ns()}", "created": int(time.time()), "model": model}
+
+        if not body.get("stream"):
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+
+        async def events():
+            for word in text.split(" "):
+                chunk = {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(chunk_delay)
+            if include_usage:
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def stats():
+        return {"calls": dict(calls)}
+
+    return app
+
+
+def cli():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0, help="mean seconds before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    app = make_app(args.latency, args.jitter, args.error_rate, args.chunk_delay)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,111 @@
+"""Login throughput under a session-start burst.
+
+Registers --users participants, then has all of them log in at once with
+--concurrency requests in flight, while a separate client keeps polling an
+authenticated endpoint the way waiting participants do. Reports logins per
+second and the poll latency seen during the burst.
+
+Run from backend/ and compare the password pool against the old behaviour
+of hashing on the request threadpool:
+
+    python benchmarks/login_throughput.py --users 200
+    PASSWORD_HASH_WORKERS=0 python benchmarks/login_throughput.py --users 200
+
+DATABASE_URL defaults to a throwaway SQLite file; BCRYPT_ROUNDS applies.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def run(users: int, concurrency: int, prefix: str):
+    async with main.app.router.lifespan_context(main.app):
+        return await _run(users, concurrency, prefix)
+
+
+async def _run(users: int, concurrency: int, prefix: str):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        emails = [f"{prefix}{i}@bench.local" for i in range(users)]
+        gate = asyncio.Semaphore(concurrency)
+
+        async def register(email):
+            async with gate:
+                r = await client.post("/register", data={"email": email, "password": "pw"})
+                r.raise_for_status()
+
+        await asyncio.gather(*(register(e) for e in emails))
+
+        r = await client.post("/login", data={"username": emails[0], "password": "pw"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        done = asyncio.Event()
+        poll_latencies = []
+
+        async def poll():
+            while not done.is_set():
+                t = time.perf_counter()
+                await client.get("/me", headers=headers)
+                poll_latencies.append(time.perf_counter() - t)
+                await asyncio.sleep(0.01)
+
+        login_latencies = []
+
+        async def login(email):
+            async with gate:
+                t = time.perf_counter()
+                r = await client.post("/login", data={"username": email, "password": "pw"})
+                r.raise_for_status()
+                login_latencies.append(time.perf_counter() - t)
+
+        poller = asyncio.create_task(poll())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(e) for e in emails))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await poller
+
+    return elapsed, login_latencies, poll_latencies
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    elapsed, logins, polls = asyncio.run(
+        run(args.users, args.concurrency, f"u{int(time.time())}-")
+    )
+
+    print(f"password workers : {os.getenv('PASSWORD_HASH_WORKERS', 'default')}")
+    print(f"bcrypt rounds    : {os.getenv('BCRYPT_ROUNDS', '12')}")
+    print(f"logins           : {len(logins)} in {elapsed:.2f}s ({len(logins) / elapsed:.1f}/s)")
+    print(f"login latency    : p50 {percentile(logins, 50) * 1000:.0f}ms  "
+          f"p99 {percentile(logins, 99) * 1000:.0f}ms")
+    print(f"/me during burst : n={len(polls)}  p50 {percentile(polls, 50) * 1000:.1f}ms  "
+          f"p99 {percentile(polls, 99) * 1000:.1f}ms  "
+          f"mean {statistics.fmean(polls) * 1000 if polls else 0:.1f}ms")
+
+
+if __name__ == "__main__":
+    cli()
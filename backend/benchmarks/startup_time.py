@@ -0,0 +1,88 @@
+"""Application startup time, for one worker or several starting together.
+
+Starts --workers fresh interpreters at once, the way a process manager
+starts uvicorn/gunicorn workers, and has each import main and run the
+app's startup (lifespan) to completion. Reports per-worker import and
+startup times, and how long it took until every worker was ready.
+
+Run from backend/:
+
+    python benchmarks/startup_time.py --workers 4 --runs 3
+
+DATABASE_URL defaults to a throwaway SQLite file (the first run migrates
+it; later runs start against an existing schema). Point it at Postgres to
+see the advisory-locked bootstrap with several workers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child():
+    start = time.perf_counter()
+    sys.path.insert(0, BACKEND)
+    import main
+
+    imported = time.perf_counter()
+
+    async def lifespan():
+        async with main.app.router.lifespan_context(main.app):
+            return time.perf_counter()
+
+    ready = asyncio.run(lifespan())
+    print(json.dumps({"import": imported - start, "startup": ready - imported}))
+
+
+def run_once(workers: int, env: dict):
+    start = time.perf_counter()
+    procs = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            env=env, cwd=BACKEND, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        for _ in range(workers)
+    ]
+    results = []
+    for p in procs:
+        out, _ = p.communicate()
+        if p.returncode != 0:
+            raise SystemExit(f"worker exited with {p.returncode}; run `python -c 'import main'` to see why")
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return time.perf_counter() - start, results
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/startup.db")
+    env.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+    print(f"workers: {args.workers}  database: {env['DATABASE_URL'].split('@')[-1]}")
+    for i in range(args.runs):
+        wall, results = run_once(args.workers, env)
+        imports = [r["import"] for r in results]
+        startups = [r["startup"] for r in results]
+        print(f"run {i + 1}: all ready in {wall:.2f}s  "
+              f"import mean {statistics.fmean(imports):.2f}s max {max(imports):.2f}s  "
+              f"startup mean {statistics.fmean(startups):.2f}s max {max(startups):.2f}s")
+
+
+if __name__ == "__main__":
+    cli()
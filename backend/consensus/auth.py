@@ -1,20 +1,23 @@
 import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from .db import SessionLocal
+from .db import AsyncSessionLocal, SessionLocal
 from .models import User
-from passlib.context import CryptContext
+from .pubsub import pubsub
+from .passwords import hash_password, verify_password
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from types import SimpleNamespace
 
 
 SECRET_KEY = "your‑jwt‑secret"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 def get_db():
@@ -24,11 +27,13 @@ def get_db():
     finally:
         db.close()
 
-def verify_password(plain, hashed):
-    return pwd_context.verify(plain, hashed)
+async def get_async_db():
+    # For async def endpoints: the same database through the async engine.
+    async with AsyncSessionLocal() as db:
+        yield db
 
 def get_password_hash(pw):
-    return pwd_context.hash(pw)
+    return hash_password(pw)
 
 def authenticate_user(db: Session, username: str, password: str):
     user = db.query(User).filter(User.username == username).first()
@@ -42,17 +47,102 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@dataclass(frozen=True)
+class Principal:
+    # What request handlers need to know about the caller. Immutable and
+    # detached from any session, so it can be cached across requests.
+    id: int
+    email: str
+    is_admin: bool
+
+
+class PrincipalCache:
+    # Short-lived per-process cache of principals by user id (and by email for
+    # the dummy-token admin). Entries are dropped explicitly when a user's
+    # admin flag or password changes; the TTL bounds anything missed.
+
+    def __init__(self):
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _ttl(self) -> float:
+        return float(os.getenv("AUTH_CACHE_TTL", "30"))
+
+    def get(self, key: str) -> Principal | None:
+        with self._lock:
+            hit = self._entries.get(key)
+            if not hit:
+                return None
+            if hit[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return hit[1]
+
+    def put(self, key: str, principal: Principal):
+        if self._ttl() <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl(), principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > int(os.getenv("AUTH_CACHE_SIZE", "10000")):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int | None = None, email: str | None = None):
+        with self._lock:
+            for key, (_, principal) in list(self._entries.items()):
+                if principal.id == user_id or principal.email == email:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+def _principal(user: User) -> Principal:
+    return Principal(id=user.id, email=user.email, is_admin=bool(user.is_admin))
+
+
+def invalidate_user(user_id: int | None = None, email: str | None = None):
+    principal_cache.invalidate(user_id=user_id, email=email)
+
+
+async def publish_user_invalidation(user_id: int | None = None, email: str | None = None):
+    # Drops the cached principal on every worker, not just this one.
+    await pubsub.publish({"type": "principal_invalidated", "user_id": user_id, "email": email})
+
+
+async def _on_event(event: dict):
+    if event.get("type") == "principal_invalidated":
+        invalidate_user(event.get("user_id"), event.get("email"))
+
+
+pubsub.subscribe(_on_event)
+
+
+# Plain def, like the sync session they query through: FastAPI runs them in
+# the threadpool, so a slow or locked database never stalls the event loop.
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
     admin_email = os.environ.get("ADMIN_EMAIL", "admin@example.com")
 
     # if token == "dummy-token":
     #     return SimpleNamespace(email="admin@example.com", is_admin=True)
     if token == "dummy-token":
+        key = f"email:{admin_email}"
+        cached = principal_cache.get(key)
+        if cached:
+            return cached
         admin = db.query(User).filter(User.email == admin_email).first()
         if not admin:
             raise HTTPException(status_code=401, detail="Dummy admin not found")
-        return admin
+        principal = _principal(admin)
+        principal_cache.put(key, principal)
+        return principal
 
 
 
@@ -63,10 +153,36 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+
+    key = f"id:{user_id}"
+    cached = principal_cache.get(key)
+    if cached:
+        return cached
+
     user = db.query(User).filter(User.id == int(user_id)).first()
     if not user:
         raise credentials_exception
-    return user
+    principal = _principal(user)
+    principal_cache.put(key, principal)
+    return principal
+
+
+def get_token_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    # For read-only participant endpoints: with AUTH_TRUST_TOKEN_CLAIMS=1 the
+    # signed claims are taken as is, without touching the cache or the
+    # database. Tokens without the claims fall back to get_current_user.
+    if os.getenv("AUTH_TRUST_TOKEN_CLAIMS") == "1" and token != "dummy-token":
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        if payload.get("sub") is not None and payload.get("email") is not None:
+            return Principal(
+                id=int(payload["sub"]),
+                email=payload["email"],
+                is_admin=bool(payload.get("is_admin")),
+            )
+    return get_current_user(token, db)
 
 async def get_admin_user(user: User = Depends(get_current_user)):
     if not user.is_admin:
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from .auth import invalidate_user
+from .db import SessionLocal, engine
+from .models import User
+from .passwords import hash_password, verify_and_update
+from .schema import upgrade_database
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock; run a single worker there
+    fcntl = None
+
+# Fixed key for pg_advisory_lock; every worker contends for the same one.
+BOOTSTRAP_LOCK_ID = 72612001
+LOCK_POLL_SECONDS = 0.25
+
+
+@contextmanager
+def _advisory_lock():
+    # Autocommit, and polled with try-lock rather than blocking in
+    # pg_advisory_lock: a waiting statement is an open transaction, which
+    # CREATE INDEX CONCURRENTLY in the leader's migrations would wait on.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        args = {"key": BOOTSTRAP_LOCK_ID}
+
+        def acquire():
+            return conn.execute(text("SELECT pg_try_advisory_lock(:key)"), args).scalar()
+
+        def release():
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), args)
+
+        yield acquire, release
+
+
+@contextmanager
+def _file_lock():
+    # SQLite: an flock on a file named after the database, in the temp dir.
+    path = engine.url.database
+    if fcntl is None or not path or path == ":memory:":
+        yield (lambda: True), (lambda: None)
+        return
+
+    digest = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    with open(os.path.join(tempfile.gettempdir(), f"consensus-bootstrap-{digest}.lock"), "a") as f:
+
+        def acquire():
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                return False
+
+        yield acquire, (lambda: fcntl.flock(f, fcntl.LOCK_UN))
+
+
+@contextmanager
+def bootstrap_lock():
+    # Yields True in the one worker that should bootstrap. The others wait
+    # for it to finish and yield False: by then the schema and the admin
+    # account are in place.
+    backend = _advisory_lock if engine.dialect.name == "postgresql" else _file_lock
+    with backend() as (acquire, release):
+        leader = acquired = acquire()
+        while not acquired:
+            time.sleep(LOCK_POLL_SECONDS)
+            acquired = acquire()
+        try:
+            yield leader
+        finally:
+            release()
+
+
+def ensure_admin() -> bool:
+    # True if the admin account was created or changed.
+    admin_email = os.environ.get("ADMIN_EMAIL", "admin@example.com")
+    admin_password = os.environ.get("ADMIN_PASSWORD", "change-me-now")
+
+    with SessionLocal() as db:
+        admin = db.query(User).filter(User.email == admin_email).first()
+        if not admin:
+            db.add(User(
+                email=admin_email,
+                hashed_password=hash_password(admin_password),
+                is_admin=True
+            ))
+        else:
+            if not admin.is_admin:
+                admin.is_admin = True
+            # Only rehash when ADMIN_PASSWORD (or BCRYPT_ROUNDS) changed.
+            valid, new_hash = verify_and_update(admin_password, admin.hashed_password)
+            if not valid:
+                admin.hashed_password = hash_password(admin_password)
+            elif new_hash:
+                admin.hashed_password = new_hash
+
+        changed = bool(db.new or db.dirty)
+        if changed:
+            try:
+                db.commit()
+            except IntegrityError:
+                # Created concurrently by a process outside the bootstrap lock.
+                db.rollback()
+            invalidate_user(email=admin_email)
+
+    print("✅ Admin user exists:", admin_email)
+    return changed
+
+
+def bootstrap() -> str | None:
+    # Blocking; run it off the event loop. Returns the admin's email if the
+    # account changed, for the caller to invalidate on other workers (those
+    # of a previous deployment may still be serving) once pub/sub is up.
+    with bootstrap_lock() as leader:
+        if not leader:
+            print("Bootstrap done by another worker")
+            return None
+
+        # Schema changes live in migrations/. Deployments that migrate as a
+        # separate step (`alembic upgrade head`) can set RUN_MIGRATIONS=0.
+        if os.getenv("RUN_MIGRATIONS", "1") == "1":
+            upgrade_database()
+        if ensure_admin():
+            return os.environ.get("ADMIN_EMAIL", "admin@example.com")
+        return None
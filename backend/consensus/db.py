@@ -1,15 +1,191 @@
+import bisect
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 Base = declarative_base()
 
+# Upper bounds, in seconds, of the checkout wait histogram buckets.
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class WaitHistogram:
+    def __init__(self, buckets=POOL_WAIT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.timeouts = 0
+
+    def observe(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+                running += n
+                cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "timeouts": self.timeouts,
+                "buckets": cumulative,
+            }
+
+
+class _TimedCheckout:
+    # Times every checkout from the pool, i.e. how long a request waited for
+    # a connection (including opening a new one).
+
+    wait_histogram: WaitHistogram
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_histogram.observe(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_histogram.observe(time.perf_counter() - start)
+        return conn
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    wait_histogram = WaitHistogram()
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    wait_histogram = WaitHistogram()
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def pool_options(database_url: str, poolclass=InstrumentedQueuePool) -> dict:
+    # SQLite gets SQLAlchemy's defaults; the knobs are for server databases.
+    # Size the pool so that workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays
+    # under the server's max_connections.
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "-1")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", "0"),
+    }
+
+
+def configure_sqlite(engine):
+    # The sync and async engines are two connection pools writing the same
+    # file. WAL lets readers carry on while one of them writes, and
+    # busy_timeout makes a writer wait up to SQLITE_BUSY_TIMEOUT seconds for
+    # the lock instead of failing with "database is locked".
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if engine.url.database not in (None, "", ":memory:"):
+            cursor.execute("PRAGMA journal_mode=WAL")
+        timeout_ms = int(float(os.getenv("SQLITE_BUSY_TIMEOUT", "30")) * 1000)
+        cursor.execute(f"PRAGMA busy_timeout={timeout_ms}")
+        cursor.close()
+
+
 def get_engine():
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         raise RuntimeError("DATABASE_URL is not set")
-    return create_engine(database_url)
+    engine = create_engine(database_url, **pool_options(database_url))
+    configure_sqlite(engine)
+    return engine
 
 engine = get_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# The async engine serves the async endpoints, so they never block the event
+# loop on the database. Same database, pool settings and sessions; only the
+# driver differs.
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(database_url: str) -> str:
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+_async_engine = None
+_async_sessions = None
+
+
+def get_async_engine():
+    # Created on first use, so scripts that only need the sync engine (the
+    # alembic CLI, benchmarks) don't need the async drivers installed.
+    global _async_engine, _async_sessions
+    if _async_engine is None:
+        url = async_database_url(os.environ["DATABASE_URL"])
+        _async_engine = create_async_engine(url, **pool_options(url, InstrumentedAsyncQueuePool))
+        configure_sqlite(_async_engine.sync_engine)
+        # expire_on_commit=False: handlers read attributes after committing,
+        # and an async session cannot lazily refresh them.
+        _async_sessions = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    get_async_engine()
+    return _async_sessions()
+
+
+async def dispose_async_engine():
+    global _async_engine, _async_sessions
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_sessions = None
+
+
+def _pool_stats(pool) -> dict:
+    stats = {"class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, _TimedCheckout):
+        stats["wait_seconds"] = pool.wait_histogram.snapshot()
+    return stats
+
+
+def pool_stats() -> dict:
+    stats = _pool_stats(engine.pool)
+    if _async_engine is not None:
+        stats["async"] = _pool_stats(_async_engine.sync_engine.pool)
+    return stats
@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+from sqlalchemy import tuple_
+
+from .db import SessionLocal
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+EXPORT_FIELDS = ["id", "round_id", "email", "timestamp", "answers"]
+
+
+def _pages(query, order_by, after, batch_size: int):
+    # Walks the query in order_by order one page at a time, resuming after
+    # the last row seen (after(row) filters to the rows past it), so no page
+    # needs an OFFSET scan and each page is read through a server-side cursor.
+    last = None
+    while True:
+        q = query if last is None else query.filter(after(last))
+        page = (
+            q.order_by(*(col.asc() for col in order_by))
+            .limit(batch_size)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+
+        count = 0
+        for row in page:
+            count += 1
+            last = row
+            yield row
+
+        if count < batch_size:
+            return
+
+
+def keyset_rows(query, created_col, id_col, batch_size: int | None = None):
+    # In (created_at, id) order. Rows without a created_at come first, keyed
+    # on id alone: a NULL never compares greater than a key, so they can't
+    # share the (created_at, id) keyset, and coalescing would lose the index.
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    yield from _pages(
+        query.filter(created_col.is_(None)), [id_col],
+        lambda last: id_col > last.id, batch_size,
+    )
+    yield from _pages(
+        query.filter(created_col.isnot(None)), [created_col, id_col],
+        lambda last: tuple_(created_col, id_col) > tuple_(last.created_at, last.id), batch_size,
+    )
+
+
+def _record(row):
+    return {
+        "id": row.id,
+        "round_id": row.round_id,
+        "email": row.email,
+        "timestamp": row.created_at.isoformat() if row.created_at else None,
+        "answers": row.answers,
+    }
+
+
+def _ndjson(rows):
+    for row in rows:
+        yield json.dumps(_record(row)) + "\n"
+
+
+def _csv(rows):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        record = _record(row)
+        record["answers"] = json.dumps(record["answers"])
+        writer.writerow(record)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def stream_export(build_query, created_col, id_col, fmt: str):
+    # build_query receives the export's own session; the request session is
+    # closed long before a large export finishes streaming.
+    with SessionLocal() as db:
+        rows = keyset_rows(build_query(db), created_col, id_col)
+        encode = _csv if fmt == "csv" else _ndjson
+        yield from encode(rows)
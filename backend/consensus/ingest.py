@@ -0,0 +1,251 @@
+import codecs
+import csv
+import io
+import json
+import os
+from datetime import datetime, timezone
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .models import ArchivedResponse, FormModel, Response, RoundModel, User
+from .passwords import UNUSABLE_PASSWORD, new_invite
+from .responses import dialect_insert, archive_responses, upsert_responses
+
+INGEST_FORMATS = ("ndjson", "csv")
+MAX_REPORTED_ERRORS = 50
+
+
+def ingest_batch_size() -> int:
+    return int(os.getenv("INGEST_BATCH_SIZE", "500"))
+
+
+class IngestError(Exception):
+    def __init__(self, errors: list[dict]):
+        super().__init__(f"{len(errors)} invalid record(s)")
+        self.errors = errors
+
+
+def decode_lines(chunks):
+    # bytes chunks -> text lines (with their line endings), split across
+    # chunk boundaries as needed. A UTF-8 BOM from spreadsheet exports is
+    # dropped.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _ndjson_records(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, None, f"invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "expected a JSON object"
+            continue
+        yield number, record, None
+
+
+def _csv_records(lines):
+    # Either an `answers` column holding JSON (the export format), or one
+    # column per question named q1, q2, ...
+    reader = csv.DictReader(lines)
+    for record in reader:
+        number = reader.line_num
+        if "answers" in record:
+            try:
+                record["answers"] = json.loads(record["answers"] or "{}")
+            except json.JSONDecodeError as e:
+                yield number, None, f"invalid answers JSON: {e.msg}"
+                continue
+        else:
+            record["answers"] = {
+                k: v for k, v in record.items()
+                if k and k.startswith("q") and k[1:].isdigit()
+            }
+        yield number, record, None
+
+
+def _validate(record: dict, keys: list[str]):
+    email = (record.get("email") or "").strip()
+    if "@" not in email:
+        return None, "email is missing or invalid"
+
+    answers = record.get("answers")
+    if not isinstance(answers, dict):
+        return None, "answers must be an object"
+    unknown = sorted(set(answers) - set(keys))
+    if unknown:
+        return None, f"unknown question keys: {', '.join(unknown)}"
+    if any(v is not None and not isinstance(v, str) for v in answers.values()):
+        return None, "answers must be strings"
+
+    created_at = None
+    if record.get("timestamp"):
+        try:
+            created_at = datetime.fromisoformat(record["timestamp"])
+        except (TypeError, ValueError):
+            return None, "timestamp is not ISO 8601"
+        if created_at.tzinfo is not None:
+            # Stored naive, in UTC, like every other created_at.
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return {
+        "email": email,
+        # Same shape the form page submits: every question present.
+        "answers": {k: answers.get(k) or "" for k in keys},
+        "created_at": created_at,
+    }, None
+
+
+def _user_ids(db: Session, emails: set[str], invites: dict[str, str]) -> dict[str, int]:
+    # Participants without an account get one with no password, which only
+    # the invite token added to `invites` can claim (see /register).
+    found = dict(db.execute(select(User.email, User.id).where(User.email.in_(emails))).all())
+    tokens, missing = {}, []
+    for email in emails - found.keys():
+        tokens[email], digest = new_invite()
+        missing.append({"email": email, "hashed_password": UNUSABLE_PASSWORD, "is_admin": False,
+                        "reset_token": digest})
+    if missing:
+        insert = dialect_insert(db)
+        if insert is not None:
+            db.execute(insert(User).values(missing).on_conflict_do_nothing(index_elements=[User.email]))
+        else:
+            db.execute(User.__table__.insert(), missing)
+        digests = {m["email"]: m["reset_token"] for m in missing}
+        for email, user_id, digest in db.execute(
+            select(User.email, User.id, User.reset_token).where(User.email.in_(digests))
+        ):
+            found[email] = user_id
+            # Not ours if the account was created concurrently.
+            if digest == digests[email]:
+                invites[email] = tokens[email]
+    return found
+
+
+def _copy_archive(db: Session, rows: list[dict]) -> bool:
+    # COPY is only reachable through psycopg2's raw cursor; on the session's
+    # own connection, so it is part of the import's transaction.
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql" or bind.dialect.driver != "psycopg2":
+        return False
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([
+            row["form_id"], row["user_id"], row["email"], json.dumps(row["answers"]),
+            (row["created_at"] or datetime.utcnow()).isoformat(), row["round_id"],
+        ])
+    buf.seek(0)
+    raw = db.connection().connection.driver_connection
+    with raw.cursor() as cur:
+        cur.copy_expert(
+            f"COPY {ArchivedResponse.__tablename__} "
+            "(form_id, user_id, email, answers, created_at, round_id) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buf,
+        )
+    return True
+
+
+def _write_batch(db: Session, form_id: int, round_id: int, batch: list[dict], invites: dict[str, str]):
+    ids = _user_ids(db, {r["email"] for r in batch}, invites)
+    archived = [{
+        "form_id": form_id,
+        "user_id": ids[r["email"]],
+        "email": r["email"],
+        "answers": r["answers"],
+        "created_at": r["created_at"],
+        "round_id": round_id,
+    } for r in batch]
+
+    # ON CONFLICT cannot touch the same row twice in one statement; the last
+    # record for a participant wins, as if they had resubmitted.
+    latest = {}
+    for row in archived:
+        latest[row["user_id"]] = {
+            "form_id": form_id,
+            "user_id": row["user_id"],
+            "round_id": round_id,
+            "answers": row["answers"],
+            "created_at": row["created_at"],
+        }
+    upsert_responses(db, list(latest.values()))
+
+    if not _copy_archive(db, archived):
+        now = datetime.utcnow()
+        archive_responses(db, [{**row, "created_at": row["created_at"] or now} for row in archived])
+
+
+def ingest_responses(form_id: int, round_id: int | None, fmt: str, lines) -> dict:
+    # Runs in a worker thread; `lines` may block while the upload arrives.
+    # All or nothing: any invalid record rolls the whole import back, after
+    # reading on to report (up to MAX_REPORTED_ERRORS of) the rest.
+    batch_size = ingest_batch_size()
+    with SessionLocal() as db:
+        form = db.get(FormModel, form_id)
+        if not form:
+            raise LookupError("Form not found")
+        if round_id is None:
+            round_id = form.active_round_id
+        rnd = db.get(RoundModel, round_id) if round_id is not None else None
+        if not rnd or rnd.form_id != form_id:
+            raise LookupError("Round not found")
+
+        questions = rnd.questions or form.questions or []
+        keys = [f"q{i + 1}" for i in range(len(questions))]
+
+        records = _csv_records(lines) if fmt == "csv" else _ndjson_records(lines)
+        errors, batch, imported, invites = [], [], 0, {}
+        for number, record, error in records:
+            if error is None:
+                record, error = _validate(record, keys)
+            if error is not None:
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": number, "error": error})
+                batch = []
+                continue
+            if errors:
+                continue
+            batch.append(record)
+            if len(batch) >= batch_size:
+                _write_batch(db, form_id, round_id, batch, invites)
+                imported += len(batch)
+                batch = []
+
+        if errors:
+            db.rollback()
+            raise IngestError(errors)
+
+        if batch:
+            _write_batch(db, form_id, round_id, batch, invites)
+            imported += len(batch)
+
+        participants = (
+            select(func.count(func.distinct(Response.user_id)))
+            .where(Response.form_id == form_id)
+            .scalar_subquery()
+        )
+        db.execute(update(FormModel).where(FormModel.id == form_id).values(participant_count=participants))
+        db.commit()
+
+    # Invite tokens exist nowhere else: the admin passes them on to the new
+    # participants.
+    return {
+        "imported": imported,
+        "round_id": round_id,
+        "invites": [{"email": e, "invite_token": t} for e, t in sorted(invites.items())],
+    }
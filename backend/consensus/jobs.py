@@ -0,0 +1,338 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+
+from .db import SessionLocal
+from .models import SynthesisJob
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+JOB_FIELDS = (
+    "id", "form_id", "round_id", "dedupe_key", "status", "progress",
+    "params", "result", "error", "created_at", "updated_at",
+)
+
+
+def _stale_after() -> timedelta:
+    # A queued/running job that hasn't been touched for this long belonged to
+    # a worker that went away: it is reaped (marked failed), and no longer
+    # blocks a fresh submission. Running jobs heartbeat well within this.
+    return timedelta(seconds=int(os.getenv("JOB_STALE_SECONDS", "900")))
+
+
+ABANDONED = "Abandoned: the worker running this job stopped updating it"
+
+
+class SQLJobStore:
+    # Default backend: the synthesis_jobs table, so every worker sees the same
+    # jobs and a status poll can land on any of them.
+
+    def _as_dict(self, row: SynthesisJob) -> dict:
+        return {f: getattr(row, f) for f in JOB_FIELDS}
+
+    def create(self, **fields) -> dict | None:
+        # None if a job with the same dedupe key is already active: the
+        # unique partial index on active jobs decides between workers.
+        with SessionLocal() as db:
+            row = SynthesisJob(**fields)
+            db.add(row)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return None
+            db.refresh(row)
+            return self._as_dict(row)
+
+    def get(self, job_id: str) -> dict | None:
+        with SessionLocal() as db:
+            row = db.get(SynthesisJob, job_id)
+            return self._as_dict(row) if row else None
+
+    def update(self, job_id: str, if_status=None, **fields) -> dict | None:
+        # With if_status, only while the job's status is one of those; None
+        # if it wasn't. A single UPDATE, so the check can't race another
+        # worker's write.
+        with SessionLocal() as db:
+            q = db.query(SynthesisJob).filter(SynthesisJob.id == job_id)
+            if if_status is not None:
+                q = q.filter(SynthesisJob.status.in_(if_status))
+            values = {getattr(SynthesisJob, k): v for k, v in fields.items()}
+            values[SynthesisJob.updated_at] = datetime.utcnow()
+            updated = q.update(values, synchronize_session=False)
+            db.commit()
+            if not updated:
+                return None
+            return self._as_dict(db.get(SynthesisJob, job_id))
+
+    def find_active(self, dedupe_key: str) -> dict | None:
+        with SessionLocal() as db:
+            row = (
+                db.query(SynthesisJob)
+                .filter(
+                    SynthesisJob.dedupe_key == dedupe_key,
+                    SynthesisJob.status.in_(ACTIVE_STATUSES),
+                    SynthesisJob.updated_at >= datetime.utcnow() - _stale_after(),
+                )
+                .order_by(SynthesisJob.created_at.desc())
+                .first()
+            )
+            return self._as_dict(row) if row else None
+
+    def reap(self, dedupe_key: str | None = None) -> int:
+        with SessionLocal() as db:
+            q = db.query(SynthesisJob).filter(
+                SynthesisJob.status.in_(ACTIVE_STATUSES),
+                SynthesisJob.updated_at < datetime.utcnow() - _stale_after(),
+            )
+            if dedupe_key is not None:
+                q = q.filter(SynthesisJob.dedupe_key == dedupe_key)
+            reaped = q.update(
+                {SynthesisJob.status: "failed", SynthesisJob.error: ABANDONED,
+                 SynthesisJob.updated_at: datetime.utcnow()},
+                synchronize_session=False,
+            )
+            db.commit()
+            return reaped
+
+
+class MemoryJobStore:
+    # Process-local backend for tests and single-worker development.
+
+    def __init__(self):
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def create(self, **fields) -> dict | None:
+        now = datetime.utcnow()
+        job = {f: None for f in JOB_FIELDS}
+        job.update(status="queued", progress=0.0, created_at=now, updated_at=now)
+        job.update(fields)
+        with self._lock:
+            if any(j["dedupe_key"] == job["dedupe_key"] and j["status"] in ACTIVE_STATUSES
+                   for j in self._jobs.values()):
+                return None
+            self._jobs[job["id"]] = job
+            return dict(job)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, if_status=None, **fields) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or (if_status is not None and job["status"] not in if_status):
+                return None
+            job.update(fields, updated_at=datetime.utcnow())
+            return dict(job)
+
+    def find_active(self, dedupe_key: str) -> dict | None:
+        cutoff = datetime.utcnow() - _stale_after()
+        with self._lock:
+            for job in sorted(self._jobs.values(), key=lambda j: j["created_at"], reverse=True):
+                if (job["dedupe_key"] == dedupe_key and job["status"] in ACTIVE_STATUSES
+                        and job["updated_at"] >= cutoff):
+                    return dict(job)
+        return None
+
+    def reap(self, dedupe_key: str | None = None) -> int:
+        now = datetime.utcnow()
+        cutoff = now - _stale_after()
+        reaped = 0
+        with self._lock:
+            for job in self._jobs.values():
+                if (job["status"] in ACTIVE_STATUSES and job["updated_at"] < cutoff
+                        and dedupe_key in (None, job["dedupe_key"])):
+                    job.update(status="failed", error=ABANDONED, updated_at=now)
+                    reaped += 1
+        return reaped
+
+
+def make_job_store():
+    backend = os.getenv("JOB_STORE", "sql")
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "sql":
+        return SQLJobStore()
+    raise RuntimeError(f"Unknown JOB_STORE: {backend}")
+
+
+class _ProgressWriter:
+    # The progress callback handed to a job. Writes go out one at a time, in
+    # order, and only the latest fraction reported while one is in flight is
+    # written after it. Called on the event loop.
+
+    def __init__(self, store, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self._pending: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def __call__(self, fraction: float):
+        if fraction >= 1:
+            return
+        self._pending = round(fraction, 3)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        while self._pending is not None:
+            fraction, self._pending = self._pending, None
+            try:
+                await run_in_threadpool(
+                    self.store.update, self.job_id, if_status=ACTIVE_STATUSES, progress=fraction
+                )
+            except Exception as e:
+                print(f"Job {self.job_id}: progress update failed: {e}")
+
+    async def drain(self):
+        # Before the job's final status, so no progress write lands after it.
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+
+class JobQueue:
+    # Runs jobs as asyncio tasks on the worker's event loop, at most
+    # JOB_WORKERS at a time. Submissions with the same dedupe key share the
+    # job that is already queued or running, wherever it was submitted.
+
+    def __init__(self, store=None):
+        self.store = store or make_job_store()
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+        self._reaper: asyncio.Task | None = None
+
+    def _limits(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(int(os.getenv("JOB_WORKERS", "4")))
+        return self._semaphore
+
+    async def start(self):
+        # From the lifespan: reap what crashed workers left queued or running,
+        # then keep doing so while this worker is up.
+        await self.reap()
+        self._reaper = asyncio.create_task(self._reap_periodically())
+
+    async def stop(self):
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+
+    async def reap(self, dedupe_key: str | None = None) -> int:
+        reaped = await run_in_threadpool(self.store.reap, dedupe_key)
+        if reaped:
+            print(f"Reaped {reaped} abandoned synthesis job(s)")
+        return reaped
+
+    async def _reap_periodically(self):
+        while True:
+            await asyncio.sleep(_stale_after().total_seconds() / 2)
+            try:
+                await self.reap()
+            except Exception as e:
+                print(f"Job reaper failed: {e}")
+
+    async def submit(self, dedupe_key: str, run, **fields) -> dict:
+        # `run` is called with a progress callback taking a 0..1 fraction and
+        # must return the job's result text.
+        semaphore = self._limits()
+        while True:
+            existing = await run_in_threadpool(self.store.find_active, dedupe_key)
+            if existing:
+                return existing
+
+            # A stale job would otherwise hold the key's slot in the index.
+            await self.reap(dedupe_key)
+            job = await run_in_threadpool(
+                self.store.create,
+                id=str(uuid.uuid4()),
+                dedupe_key=dedupe_key,
+                status="queued",
+                progress=0.0,
+                **fields,
+            )
+            if job:
+                break
+            # Another worker created it first; share theirs.
+
+        task = asyncio.create_task(self._run(job["id"], run, semaphore))
+        self._tasks[job["id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["id"], None))
+        return job
+
+    async def _run(self, job_id: str, run, semaphore: asyncio.Semaphore):
+        progress = _ProgressWriter(self.store, job_id)
+
+        async with semaphore:
+            # Not if it was cancelled while it waited for a slot.
+            running = await run_in_threadpool(self.store.update, job_id, if_status=("queued",), status="running")
+            if not running:
+                return
+            watcher = asyncio.create_task(self._watch_cancel(job_id, asyncio.current_task()))
+            try:
+                result = await run(progress)
+            except asyncio.CancelledError:
+                await progress.drain()
+                await run_in_threadpool(self.store.update, job_id, if_status=ACTIVE_STATUSES, status="cancelled")
+                return
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                await progress.drain()
+                await run_in_threadpool(
+                    self.store.update, job_id, if_status=ACTIVE_STATUSES, status="failed", error=str(e)
+                )
+                return
+            finally:
+                watcher.cancel()
+
+            await progress.drain()
+            # A cancel (from any worker) or the reaper may have finished the
+            # job since its last progress report; that status stands.
+            await run_in_threadpool(
+                self.store.update, job_id, if_status=ACTIVE_STATUSES,
+                status="succeeded", progress=1.0, result=result,
+            )
+
+    async def _watch_cancel(self, job_id: str, task: asyncio.Task):
+        # Cancel requests may arrive on another worker and only reach us
+        # through the store. Also the job's heartbeat: touching it keeps the
+        # reapers off a job that is alive but between progress reports.
+        interval = float(os.getenv("JOB_CANCEL_POLL_SECONDS", "2"))
+        heartbeat = _stale_after().total_seconds() / 4
+        last_beat = time.monotonic()
+        while not task.done():
+            await asyncio.sleep(interval)
+            job = await run_in_threadpool(self.store.get, job_id)
+            if job and job["status"] == "cancelled":
+                task.cancel()
+                return
+            if time.monotonic() - last_beat >= heartbeat:
+                await run_in_threadpool(self.store.update, job_id)
+                last_beat = time.monotonic()
+
+    async def cancel(self, job_id: str) -> dict | None:
+        job = await run_in_threadpool(self.store.get, job_id)
+        if not job or job["status"] in FINISHED_STATUSES:
+            return job
+
+        job = await run_in_threadpool(self.store.update, job_id, if_status=ACTIVE_STATUSES, status="cancelled")
+        if not job:
+            # It finished in the meantime.
+            return await run_in_threadpool(self.store.get, job_id)
+        task = self._tasks.get(job_id)
+        if task:
+            task.cancel()
+        return job
+
+    async def get(self, job_id: str) -> dict | None:
+        return await run_in_threadpool(self.store.get, job_id)
+
+
+job_queue = JobQueue()
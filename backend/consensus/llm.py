@@ -0,0 +1,447 @@
+import asyncio
+import hashlib
+import os
+import random
+import time
+from typing import TYPE_CHECKING
+
+from . import metrics
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+SYSTEM_PROMPT = "You are an expert at synthesizing and summarizing responses."
+
+# Callers use complete() and stream() below, which apply the call policy:
+#
+#   LLM_TIMEOUT            seconds for a completion, or to the first streamed
+#                          token and then between tokens (default 120)
+#   LLM_MAX_RETRIES        retries of timeouts, connection errors, 429s and
+#                          5xx, with full-jitter exponential backoff (2)
+#   LLM_FALLBACK_MODELS    comma-separated models to try, in order, when the
+#                          requested one fails
+#   LLM_HEDGE_AFTER        seconds after which a still-pending request also
+#                          goes to the first fallback; the first answer wins
+#                          (unset: no hedging)
+#
+# LLM_TIMEOUT and LLM_HEDGE_AFTER can be set per model with the _BY_MODEL
+# variants, e.g. LLM_TIMEOUT_BY_MODEL="openai/gpt-4o-mini=30,openai/o3=300".
+# LLM_PROVIDER picks the backend: "openrouter" (default) or "fake".
+
+
+class LLMError(Exception):
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def _messages(prompt: str):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _usage_options() -> dict:
+    # Ask OpenRouter to include the charge in the usage block, for the cost
+    # metric. Other OpenAI-compatible servers would reject the extra field.
+    base_url = os.getenv("OPENROUTER_BASE_URL", OPENROUTER_BASE_URL)
+    return {"extra_body": {"usage": {"include": True}}} if "openrouter.ai" in base_url else {}
+
+
+def _openai_error(e: Exception) -> LLMError:
+    import openai
+
+    retryable = isinstance(e, openai.APIConnectionError) or (
+        isinstance(e, openai.APIStatusError) and (e.status_code in (408, 409, 429) or e.status_code >= 500)
+    )
+    return LLMError(str(e), retryable=retryable)
+
+
+class OpenRouterProvider:
+    # OpenAI-compatible API over one long-lived httpx pool per worker, so
+    # calls reuse warm TLS connections. Retries are ours (see _retrying),
+    # not the SDK's, so that they are jittered and counted.
+
+    def __init__(self):
+        import httpx
+        from openai import AsyncOpenAI
+
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "50")),
+                max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "20")),
+                keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "90")),
+            ),
+            # Read timeouts are enforced per model by the policy; this only
+            # bounds connecting and a stalled socket.
+            timeout=httpx.Timeout(
+                float(os.getenv("LLM_SOCKET_TIMEOUT", "600")),
+                connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+            ),
+        )
+        self.client: "AsyncOpenAI" = AsyncOpenAI(
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            base_url=os.getenv("OPENROUTER_BASE_URL", OPENROUTER_BASE_URL),
+            http_client=self.http,
+            max_retries=0,
+        )
+
+    async def complete(self, model: str, prompt: str) -> str:
+        import openai
+
+        try:
+            completion = await self.client.chat.completions.create(
+                model=model,
+                messages=_messages(prompt),
+                **_usage_options(),
+            )
+        except openai.OpenAIError as e:
+            raise _openai_error(e) from e
+        metrics.record_llm_usage(model, completion.usage)
+        return completion.choices[0].message.content
+
+    async def stream(self, model: str, prompt: str):
+        import openai
+
+        try:
+            chunks = await self.client.chat.completions.create(
+                model=model,
+                messages=_messages(prompt),
+                stream=True,
+                # The final chunk then carries usage, with no choices.
+                stream_options={"include_usage": True},
+                **_usage_options(),
+            )
+            async for chunk in chunks:
+                if getattr(chunk, "usage", None) is not None:
+                    metrics.record_llm_usage(model, chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except openai.OpenAIError as e:
+            raise _openai_error(e) from e
+
+    async def aclose(self):
+        await self.client.close()
+
+
+class FakeProvider:
+    # Local and deterministic, for tests and benchmarks: the same model and
+    # prompt always produce the same text, after LLM_FAKE_LATENCY seconds
+    # (a number, or per model: "slow/model=5,*=0.1"). fail() queues errors
+    # for a model; calls records every (model, prompt) served or failed.
+
+    def __init__(self, latency: dict[str, float] | None = None, chunk_delay: float = 0.0):
+        if latency is None:
+            raw = os.getenv("LLM_FAKE_LATENCY", "0")
+            latency = {"*": float(raw)} if "=" not in raw else {k: float(v) for k, v in _env_map(raw).items()}
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.calls: list[tuple[str, str]] = []
+        self._failures: dict[str, list[LLMError]] = {}
+
+    def fail(self, model: str, times: int = 1, retryable: bool = True):
+        self._failures.setdefault(model, []).extend(
+            LLMError(f"fake failure from {model}", retryable=retryable) for _ in range(times)
+        )
+
+    def text(self, model: str, prompt: str) -> str:
+        digest = hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()[:12]
+        return f"Synthesis by {model} of {len(prompt)} characters of responses ({digest})."
+
+    async def _serve(self, model: str, prompt: str) -> str:
+        self.calls.append((model, prompt))
+        await asyncio.sleep(self.latency.get(model, self.latency.get("*", 0.0)))
+        failures = self._failures.get(model)
+        if failures:
+            raise failures.pop(0)
+        text = self.text(model, prompt)
+        metrics.llm_tokens.inc(len(prompt) // 4, model=model, kind="prompt")
+        metrics.llm_tokens.inc(len(text) // 4, model=model, kind="completion")
+        return text
+
+    async def complete(self, model: str, prompt: str) -> str:
+        return await self._serve(model, prompt)
+
+    async def stream(self, model: str, prompt: str):
+        words = (await self._serve(model, prompt)).split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+
+    async def aclose(self):
+        pass
+
+
+PROVIDERS = {"openrouter": OpenRouterProvider, "fake": FakeProvider}
+
+_provider = None
+
+
+def get_provider():
+    # Built on first use, so importing the routes never needs credentials
+    # and worker startup doesn't pay for importing openai.
+    global _provider
+    if _provider is None:
+        name = os.getenv("LLM_PROVIDER", "openrouter")
+        if name not in PROVIDERS:
+            raise RuntimeError(f"Unknown LLM_PROVIDER {name!r}")
+        _provider = PROVIDERS[name]()
+    return _provider
+
+
+def set_provider(provider):
+    # For tests and benchmarks, e.g. set_provider(FakeProvider()).
+    global _provider
+    _provider = provider
+
+
+async def aclose():
+    global _provider
+    if _provider is not None:
+        await _provider.aclose()
+        _provider = None
+
+
+def _env_map(raw: str) -> dict[str, str]:
+    pairs = (item.rsplit("=", 1) for item in raw.split(",") if "=" in item)
+    return {k.strip(): v.strip() for k, v in pairs}
+
+
+def _per_model(name: str, model: str, default: str | None) -> float | None:
+    value = _env_map(os.getenv(f"{name}_BY_MODEL", "")).get(model) or os.getenv(name, default)
+    return float(value) if value else None
+
+
+def model_timeout(model: str) -> float:
+    return _per_model("LLM_TIMEOUT", model, "120")
+
+
+def hedge_after(model: str) -> float | None:
+    return _per_model("LLM_HEDGE_AFTER", model, None)
+
+
+def candidates(model: str) -> list[str]:
+    fallbacks = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if m.strip()]
+    return [model] + [m for m in fallbacks if m != model]
+
+
+def _retryable(e: Exception) -> bool:
+    return isinstance(e, asyncio.TimeoutError) or (isinstance(e, LLMError) and e.retryable)
+
+
+async def _retrying(model: str, attempt):
+    # attempt() is retried on transient errors, sleeping a random time up to
+    # base * 2^n (full jitter), so that workers retrying after the same
+    # upstream blip spread out instead of arriving together.
+    retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    base = float(os.getenv("LLM_RETRY_BASE", "0.5"))
+    cap = float(os.getenv("LLM_RETRY_MAX", "8"))
+    for n in range(retries + 1):
+        try:
+            return await attempt()
+        except (LLMError, asyncio.TimeoutError) as e:
+            if n == retries or not _retryable(e):
+                raise
+            metrics.llm_retries.inc(model=model)
+            await asyncio.sleep(random.uniform(0, min(cap, base * 2 ** n)))
+
+
+def _fell_back(model: str, fallback: str, reason: str, error: Exception | None = None):
+    metrics.llm_fallbacks.inc(model=model, fallback=fallback, reason=reason)
+    detail = f": {error!r}" if error is not None else ""
+    print(f"LLM {reason}: {model} -> {fallback}{detail}")
+
+
+async def _complete_once(model: str, prompt: str) -> str:
+    with metrics.timed(metrics.llm_duration, model=model, operation="complete"):
+        return await asyncio.wait_for(get_provider().complete(model, prompt), model_timeout(model))
+
+
+async def _complete_in_order(models: list[str], prompt: str) -> str:
+    for i, model in enumerate(models):
+        try:
+            return await _retrying(model, lambda: _complete_once(model, prompt))
+        except (LLMError, asyncio.TimeoutError) as e:
+            if i == len(models) - 1:
+                raise
+            _fell_back(model, models[i + 1], "error", e)
+
+
+async def _first_success(tasks: list[asyncio.Task]):
+    # Result of whichever task succeeds first; the others are cancelled.
+    error = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                return await next_done
+            except (LLMError, asyncio.TimeoutError) as e:
+                error = e
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def complete(model: str, prompt: str) -> str:
+    models = candidates(model)
+    delay = hedge_after(model)
+    if delay is None or len(models) < 2:
+        return await _complete_in_order(models, prompt)
+
+    primary = asyncio.create_task(_complete_in_order(models[:1], prompt))
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done and not primary.exception():
+        return primary.result()
+    if done:
+        _fell_back(model, models[1], "error", primary.exception())
+        return await _complete_in_order(models[1:], prompt)
+
+    _fell_back(model, models[1], "hedge")
+    hedge = asyncio.create_task(_complete_in_order(models[1:], prompt))
+    return await _first_success([primary, hedge])
+
+
+async def _open_stream(model: str, prompt: str):
+    # A stream counts as open once its first token arrives; until then it
+    # can be retried or abandoned for another model without the caller
+    # having seen anything.
+    async def attempt():
+        chunks = get_provider().stream(model, prompt)
+        start = time.perf_counter()
+        try:
+            # asyncio.timeout rather than wait_for: the generator must be
+            # iterated from one task throughout.
+            async with asyncio.timeout(model_timeout(model)):
+                first = await anext(chunks, None)
+        except BaseException:
+            await chunks.aclose()
+            raise
+        metrics.llm_first_token.observe(time.perf_counter() - start, model=model)
+        return model, chunks, first
+
+    return await _retrying(model, attempt)
+
+
+async def _open_in_order(models: list[str], prompt: str):
+    for i, model in enumerate(models):
+        try:
+            return await _open_stream(model, prompt)
+        except (LLMError, asyncio.TimeoutError) as e:
+            if i == len(models) - 1:
+                raise
+            _fell_back(model, models[i + 1], "error", e)
+
+
+async def _read(served_by: str, chunks, first):
+    # The rest of an opened stream. Past the first token there is no
+    # switching models: the caller has already passed it on.
+    try:
+        if first is None:
+            return
+        yield first
+        timeout = model_timeout(served_by)
+        while True:
+            async with asyncio.timeout(timeout):
+                delta = await anext(chunks, None)
+            if delta is None:
+                return
+            yield delta
+    finally:
+        await chunks.aclose()
+
+
+class _Relay:
+    # One hedged candidate. Its stream is opened and read to the end inside
+    # the relay's own task, since an async generator must not move between
+    # tasks, and handed to the caller through a queue. `opened` resolves to
+    # the relay once the first token is in.
+
+    def __init__(self, models: list[str], prompt: str):
+        self.served_by = None
+        self.opened = asyncio.get_running_loop().create_future()
+        self._deltas: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(models, prompt))
+
+    async def _run(self, models: list[str], prompt: str):
+        try:
+            self.served_by, chunks, first = await _open_in_order(models, prompt)
+        except asyncio.CancelledError:
+            self.opened.cancel()
+            raise
+        except Exception as e:
+            if not self.opened.done():
+                self.opened.set_exception(e)
+            return
+        if self.opened.done():
+            # Lost the race as it opened.
+            await chunks.aclose()
+            return
+        self.opened.set_result(self)
+        try:
+            async for delta in _read(self.served_by, chunks, first):
+                self._deltas.put_nowait(delta)
+            self._deltas.put_nowait(None)
+        except Exception as e:
+            self._deltas.put_nowait(e)
+
+    async def read(self):
+        try:
+            while True:
+                delta = await self._deltas.get()
+                if delta is None:
+                    return
+                if isinstance(delta, Exception):
+                    raise delta
+                yield delta
+        finally:
+            self.close()
+
+    def close(self):
+        self.task.cancel()
+
+
+async def _open_hedged(models: list[str], delay: float, prompt: str) -> _Relay:
+    relays = [_Relay(models[:1], prompt)]
+    winner = None
+    try:
+        primary = relays[0].opened
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done and not primary.exception():
+            winner = relays[0]
+        elif done:
+            _fell_back(models[0], models[1], "error", primary.exception())
+            relays.append(_Relay(models[1:], prompt))
+            winner = await relays[1].opened
+        else:
+            _fell_back(models[0], models[1], "hedge")
+            relays.append(_Relay(models[1:], prompt))
+            winner = await _first_success([r.opened for r in relays])
+        return winner
+    finally:
+        for relay in relays:
+            if relay is not winner:
+                relay.close()
+
+
+async def stream(model: str, prompt: str):
+    models = candidates(model)
+    delay = hedge_after(model)
+    if delay is None or len(models) < 2:
+        served_by, chunks, first = await _open_in_order(models, prompt)
+        deltas = _read(served_by, chunks, first)
+    else:
+        relay = await _open_hedged(models, delay, prompt)
+        served_by, deltas = relay.served_by, relay.read()
+
+    with metrics.timed(metrics.llm_duration, model=served_by, operation="stream"):
+        try:
+            async for delta in deltas:
+                yield delta
+        finally:
+            await deltas.aclose()
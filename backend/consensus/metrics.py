@@ -0,0 +1,368 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Prometheus text exposition of this worker's metrics. Every sample carries
+# worker="<pid>", so series from different uvicorn workers behind one port
+# stay distinct; each scrape sees whichever worker served it.
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+LLM_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+SMTP_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+WORKER = str(os.getpid())
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [("worker", WORKER), *zip(names, values), *extra]
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (last one is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                running += n
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {running}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+        # Callables run at scrape time, for values owned elsewhere (pool
+        # occupancy, open sockets) that are cheaper to read than to track.
+        # They may return extra exposition lines.
+        self.collectors = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for collect in self.collectors:
+            lines += collect() or []
+        for metric in self.metrics:
+            samples = metric.render()
+            if samples:
+                lines += metric.header() + samples
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ["method", "route", "status"])
+http_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ["method", "route"])
+http_queries = Histogram(
+    "http_request_db_queries", "Database queries issued per HTTP request.", ["method", "route"], COUNT_BUCKETS)
+# Per form as counters and sums only (rate(sum) / rate(count) = mean latency),
+# which keeps the series count to routes x forms rather than x buckets too.
+form_requests = Counter(
+    "form_requests_total", "HTTP requests per form.", ["route", "form_id"])
+form_seconds = Counter(
+    "form_request_seconds_total", "Total HTTP request time per form.", ["route", "form_id"])
+form_queries = Counter(
+    "form_db_queries_total", "Database queries per form.", ["route", "form_id"])
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "Database statement latency by originating route.", ["route"], QUERY_BUCKETS)
+ws_connections = Gauge("websocket_connections", "Open WebSocket connections on this worker.")
+ws_dropped = Counter("websocket_dropped_total", "WebSockets dropped for not keeping up.")
+llm_duration = Histogram(
+    "llm_request_duration_seconds", "LLM call latency, per attempt.", ["model", "operation", "outcome"], LLM_BUCKETS)
+llm_first_token = Histogram(
+    "llm_time_to_first_token_seconds", "Latency to the first streamed token.", ["model"], LLM_BUCKETS)
+llm_tokens = Counter("llm_tokens_total", "Tokens reported by OpenRouter.", ["model", "kind"])
+llm_cost = Counter("llm_cost_usd_total", "Cost reported by OpenRouter, in USD.", ["model"])
+llm_retries = Counter("llm_retries_total", "LLM calls retried after a transient error.", ["model"])
+llm_fallbacks = Counter(
+    "llm_fallbacks_total", "Requests sent to a fallback model, by reason (error or hedge).",
+    ["model", "fallback", "reason"])
+synthesis_prompt_tokens = Counter(
+    "synthesis_prompt_tokens_total", "Estimated response tokens before (raw) and after (sent) compaction.", ["kind"])
+smtp_duration = Histogram("smtp_send_duration_seconds", "SMTP send latency.", ["outcome"], SMTP_BUCKETS)
+db_pool_checked_out = Gauge("db_pool_checked_out", "Connections checked out of the pool.", ["engine"])
+db_pool_overflow = Gauge("db_pool_overflow", "Connections open beyond the pool size.", ["engine"])
+db_pool_size = Gauge("db_pool_size", "Configured pool size.", ["engine"])
+# A gauge mirroring the pool's own running total, which only resets with it.
+db_pool_timeouts = Gauge("db_pool_checkout_timeouts", "Checkouts that timed out waiting.", ["engine"])
+
+
+POOL_WAIT = "db_pool_checkout_wait_seconds"
+
+
+def _collect_runtime():
+    from .db import pool_stats
+    from .ws import ws_manager
+
+    ws_connections.set(len(ws_manager.subscribers))
+
+    # The pools keep their own wait histograms (db.WaitHistogram); export
+    # those as-is rather than timing checkouts twice.
+    lines = []
+    stats = pool_stats()
+    for name, pool in (("sync", stats), ("async", stats.get("async"))):
+        if not pool or "size" not in pool:
+            continue
+        db_pool_size.set(pool["size"], engine=name)
+        db_pool_checked_out.set(pool["checked_out"], engine=name)
+        db_pool_overflow.set(pool["overflow"], engine=name)
+        wait = pool.get("wait_seconds")
+        if wait is None:
+            continue
+        if not lines:
+            lines = [f"# HELP {POOL_WAIT} Time spent waiting to check out a connection.",
+                     f"# TYPE {POOL_WAIT} histogram"]
+        for bound, n in wait["buckets"].items():
+            lines.append(f"{POOL_WAIT}_bucket{_labels(['engine'], [name], [('le', bound)])} {n}")
+        lines.append(f"{POOL_WAIT}_sum{_labels(['engine'], [name])} {wait['sum']}")
+        lines.append(f"{POOL_WAIT}_count{_labels(['engine'], [name])} {wait['count']}")
+        db_pool_timeouts.set(wait["timeouts"], engine=name)
+    return lines
+
+
+registry.collectors.append(_collect_runtime)
+
+
+class _RequestStats:
+    __slots__ = ("scope", "form_id", "queries")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.form_id = None
+        self.queries = 0
+
+
+# Set by the middleware for the lifetime of a request; threadpool and
+# to_thread calls inherit it, so queries made there are attributed too.
+_current: contextvars.ContextVar[_RequestStats | None] = contextvars.ContextVar("request_stats", default=None)
+
+
+def tag_form(form_id):
+    # For handlers whose form_id isn't in the path or query string.
+    stats = _current.get()
+    if stats is not None and form_id is not None:
+        stats.form_id = str(form_id)
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _query_form_id(scope):
+    # Only for routes that declare a form_id query parameter; elsewhere it is
+    # whatever the client chose to append.
+    dependant = getattr(scope.get("route"), "dependant", None)
+    if not any(p.name == "form_id" for p in getattr(dependant, "query_params", ())):
+        return None
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("form_id")
+    return values[0] if values else None
+
+
+def _form_of(scope, stats: _RequestStats, status: int):
+    # form_id comes from the client, and every distinct value is a new set of
+    # series. Label only routed requests that weren't rejected, and only with
+    # an integer id.
+    if scope.get("route") is None or 400 <= status < 500:
+        return None
+    form_id = stats.form_id or scope.get("path_params", {}).get("form_id") or _query_form_id(scope)
+    try:
+        return str(int(form_id))
+    except (TypeError, ValueError):
+        return None
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task per request
+    # and streaming responses pass straight through. The route template is
+    # only known once routing has run, so labels are resolved at the end.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = _RequestStats(scope)
+        token = _current.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            method, route = scope["method"], _route_of(scope)
+            http_requests.inc(method=method, route=route, status=status)
+            http_duration.observe(elapsed, method=method, route=route)
+            http_queries.observe(stats.queries, method=method, route=route)
+            form_id = _form_of(scope, stats, status)
+            if form_id is not None:
+                form_requests.inc(route=route, form_id=form_id)
+                form_seconds.inc(elapsed, route=route, form_id=form_id)
+                form_queries.inc(stats.queries, route=route, form_id=form_id)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _current.get()
+    if stats is None:
+        route = "background"
+    else:
+        stats.queries += 1
+        # Routing has already put the matched route on the shared scope.
+        route = _route_of(stats.scope)
+    db_query_duration.observe(elapsed, route=route)
+
+
+def _handle_error(context):
+    # Failed statements never reach after_cursor_execute; drop their timer.
+    starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+_installed = False
+
+
+def install_sqlalchemy_events():
+    # On the Engine class, so the sync engine and the async engine's
+    # underlying sync engine are both covered.
+    global _installed
+    if not _installed:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        _installed = True
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    # Observes the block's duration with outcome="ok" or "error".
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        histogram.observe(time.perf_counter() - start, outcome=outcome, **labels)
+
+
+def record_llm_usage(model: str, usage):
+    if usage is None:
+        return
+    llm_tokens.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+    llm_tokens.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+    # OpenRouter's usage accounting adds the charge to the usage block.
+    cost = getattr(usage, "cost", None)
+    if cost is None and getattr(usage, "model_extra", None):
+        cost = usage.model_extra.get("cost")
+    if cost:
+        llm_cost.inc(float(cost), model=model)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(authorization: str | None = Header(default=None)):
+    # Open unless METRICS_TOKEN is set, in which case scrapers send it as a
+    # bearer token.
+    token = os.getenv("METRICS_TOKEN")
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
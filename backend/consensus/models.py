@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, String, Boolean, JSON
+from sqlalchemy import Column, Integer, Float, Text, DateTime, ForeignKey, String, Boolean, JSON, Index, true
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .db import Base
@@ -39,6 +39,10 @@ class FormModel(Base):
     questions = Column(JSON, nullable=False)
     allow_join = Column(Boolean, default=True)
     join_code = Column(String, unique=True, nullable=False)
+    participant_count = Column(Integer, default=0, nullable=False)
+    # Points at the round with is_active set. Not a foreign key: rounds
+    # already reference forms, and open_next_round keeps the two in step.
+    active_round_id = Column(Integer, nullable=True)
 
     rounds = relationship("RoundModel", back_populates="form", cascade="all, delete-orphan")
     responses = relationship("Response", back_populates="form", cascade="all, delete-orphan")
@@ -54,12 +58,27 @@ class RoundModel(Base):
     form_id = Column(Integer, ForeignKey("forms.id"), nullable=False)
     round_number = Column(Integer, nullable=False)
     synthesis = Column(Text, nullable=True)
+    # Set by push_summary; None for syntheses carried over to a new round.
+    synthesis_updated_at = Column(DateTime, nullable=True, index=True)
     is_active = Column(Boolean, default=True)
     questions = Column(JSON, nullable=True)
 
     form = relationship("FormModel", back_populates="rounds")
     responses = relationship("Response", back_populates="round")
     archived_responses = relationship("ArchivedResponse", back_populates="round")
+    synthesis_checkpoints = relationship(
+        "SynthesisCheckpoint", back_populates="round", cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (
+        Index("ix_rounds_form_id_is_active", "form_id", "is_active"),
+        # At most one active round per form, enforced by the database.
+        Index(
+            "uq_rounds_one_active_per_form", "form_id", unique=True,
+            postgresql_where=is_active == true(),
+            sqlite_where=is_active == true(),
+        ),
+    )
 
 
 class Response(Base):
@@ -76,6 +95,11 @@ class Response(Base):
     form = relationship("FormModel", back_populates="responses")
     round = relationship("RoundModel", back_populates="responses")
 
+    __table_args__ = (
+        Index("uq_responses_round_id_user_id", "round_id", "user_id", unique=True),
+        Index("ix_responses_form_id_created_at", "form_id", "created_at"),
+    )
+
 
 class ArchivedResponse(Base):
     __tablename__ = "archived_responses"
@@ -92,6 +116,10 @@ class ArchivedResponse(Base):
     form = relationship("FormModel", back_populates="archived_responses")
     round = relationship("RoundModel", back_populates="archived_responses")
 
+    __table_args__ = (
+        Index("ix_archived_responses_form_id_created_at", "form_id", "created_at"),
+    )
+
 
 class Feedback(Base):
     __tablename__ = "feedback"
@@ -106,3 +134,58 @@ class Feedback(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     user = relationship("User", back_populates="feedback_entries")
+
+
+class SynthesisCacheEntry(Base):
+    __tablename__ = "synthesis_cache"
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class SynthesisCheckpoint(Base):
+    __tablename__ = "synthesis_checkpoints"
+
+    round_id = Column(Integer, ForeignKey("rounds.id"), primary_key=True)
+    # Per model: one model's summary is never carried forward by another.
+    model = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False)
+    # Highest Response.id folded into the summary, plus user_id -> response_id
+    # so that resubmissions can be told apart from new participants.
+    high_water_mark = Column(Integer, nullable=False)
+    response_ids = Column(JSON, nullable=False)
+    # user_id -> created_at of the response that was folded in. Resubmissions
+    # update the row in place, so this is what tells a revision apart.
+    response_versions = Column(JSON, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    round = relationship("RoundModel", back_populates="synthesis_checkpoints")
+
+
+class SynthesisJob(Base):
+    __tablename__ = "synthesis_jobs"
+
+    # A log of work rather than form data, so no foreign keys: deleting a
+    # form must not wait on (or be blocked by) its synthesis history.
+    id = Column(String(36), primary_key=True)
+    form_id = Column(Integer, nullable=False)
+    round_id = Column(Integer, nullable=False)
+    dedupe_key = Column(String(64), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")
+    progress = Column(Float, nullable=False, default=0.0)
+    params = Column(JSON, nullable=True)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # At most one queued or running job per dedupe key, across workers.
+        Index(
+            "uq_synthesis_jobs_active_dedupe_key", "dedupe_key", unique=True,
+            postgresql_where=status.in_(("queued", "running")),
+            sqlite_where=status.in_(("queued", "running")),
+        ),
+    )
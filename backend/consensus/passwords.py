@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+
+# Kept free of application imports: pool workers are spawned processes that
+# import this module and nothing else.
+
+
+def bcrypt_rounds() -> int:
+    return int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+
+def make_context(rounds: int | None = None) -> CryptContext:
+    rounds = rounds or bcrypt_rounds()
+    # Pinning min and max to the configured cost makes needs_update() flag
+    # hashes made at any other cost, so logins rehash them transparently.
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+pwd_context = make_context()
+
+# Stored for accounts created without a password (bulk-imported participants).
+# It is not a hash of anything, so no password verifies against it.
+UNUSABLE_PASSWORD = "!"
+
+
+def is_usable(hashed: str | None) -> bool:
+    return bool(hashed) and hashed != UNUSABLE_PASSWORD
+
+
+# Such an account is claimed with an invite token handed out by the import;
+# only its digest is stored (in users.reset_token).
+
+
+def invite_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def new_invite() -> tuple[str, str]:
+    # (token for the participant, digest to store)
+    token = secrets.token_urlsafe(24)
+    return token, invite_digest(token)
+
+
+def invite_matches(token: str | None, digest: str | None) -> bool:
+    return bool(token) and bool(digest) and hmac.compare_digest(invite_digest(token), digest)
+
+
+def hash_password(pw: str) -> str:
+    return pwd_context.hash(pw)
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    if not is_usable(hashed):
+        return False
+    return pwd_context.verify(plain, hashed)
+
+
+def verify_and_update(plain: str, hashed: str):
+    # (valid, replacement hash or None)
+    if not is_usable(hashed):
+        return False, None
+    return pwd_context.verify_and_update(plain, hashed)
+
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    if _pool is None:
+        workers = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        if workers > 0:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _pool
+
+
+async def _offload(fn, *args):
+    pool = _get_pool()
+    if pool is None:
+        # PASSWORD_HASH_WORKERS=0: hash on the request threadpool, as before
+        # the pool existed. Useful as a baseline and on single-core hosts.
+        from anyio import to_thread
+        return await to_thread.run_sync(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+
+async def hash_password_async(pw: str) -> str:
+    return await _offload(hash_password, pw)
+
+
+async def verify_and_update_async(plain: str, hashed: str):
+    return await _offload(verify_and_update, plain, hashed)
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,138 @@
+import contextvars
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Opt-in per-request SQL profile (QUERY_PROFILE=1): every statement a request
+# runs is counted and timed, and statements repeated QUERY_PROFILE_REPEAT or
+# more times with identical SQL (i.e. differing only in parameters) are
+# reported as N+1 suspects. Off by default; nothing is hooked in unless on.
+
+
+def enabled() -> bool:
+    return os.getenv("QUERY_PROFILE", "0").lower() in ("1", "true", "yes")
+
+
+def repeat_threshold() -> int:
+    return int(os.getenv("QUERY_PROFILE_REPEAT", "3"))
+
+
+class QueryProfile:
+    def __init__(self):
+        self.statements: list[tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, statement: str, seconds: float):
+        with self._lock:
+            self.statements.append((statement, seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(s for _, s in self.statements)
+
+    def repeated(self, threshold: int | None = None) -> list[tuple[str, int]]:
+        threshold = repeat_threshold() if threshold is None else threshold
+        counts = Counter(sql for sql, _ in self.statements)
+        return [(sql, n) for sql, n in counts.most_common() if n >= threshold]
+
+    def report(self, threshold: int | None = None) -> str:
+        lines = [f"{self.count} queries in {self.seconds * 1000:.1f}ms"]
+        for sql, n in self.repeated(threshold):
+            lines.append(f"  N+1 suspect, {n}x: {' '.join(sql.split())[:300]}")
+        return "\n".join(lines)
+
+
+# The request being profiled (inherited by threadpool/to_thread calls), plus
+# any process-wide recorders; the latter see statements from every thread,
+# which is what tests need, as TestClient runs the app on its own thread.
+_current: contextvars.ContextVar[QueryProfile | None] = contextvars.ContextVar("query_profile", default=None)
+_recorders: list[QueryProfile] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("profile_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.add(statement, elapsed)
+    for recorder in _recorders:
+        recorder.add(statement, elapsed)
+
+
+def _handle_error(context):
+    starts = context.connection.info.get("profile_query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+_installed = False
+
+
+def install_sqlalchemy_events():
+    global _installed
+    if not _installed:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        _installed = True
+
+
+@contextmanager
+def record_queries():
+    # Every statement run anywhere in the process while the block runs.
+    install_sqlalchemy_events()
+    profile = QueryProfile()
+    _recorders.append(profile)
+    try:
+        yield profile
+    finally:
+        _recorders.remove(profile)
+
+
+class QueryProfileMiddleware:
+    # Adds X-Query-Count / X-Query-Time-Ms (and X-Query-Repeats when there
+    # are N+1 suspects) to every response, and prints one line per request,
+    # plus the suspect statements. Headers cover the queries made before the
+    # response started; for streamed responses the log line has the total.
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = QueryProfile()
+        token = _current.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(profile.count).encode()))
+                headers.append((b"x-query-time-ms", f"{profile.seconds * 1000:.1f}".encode()))
+                repeats = profile.repeated()
+                if repeats:
+                    headers.append((b"x-query-repeats", str(repeats[0][1]).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            print(f"[query-profile] {scope['method']} {route}: {profile.report()}")
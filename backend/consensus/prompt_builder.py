@@ -0,0 +1,231 @@
+import os
+import random
+import re
+import zlib
+
+from . import metrics
+
+# Turns a round's responses into prompt blocks without the waste: blank
+# answers are left out, identical and near-identical answers to the same
+# question appear once with the number of participants who gave them, and
+# overlong answers are cut to SYNTHESIS_MAX_ANSWER_TOKENS. What that saved
+# is reported per synthesis.
+
+CHARS_PER_TOKEN = 4
+BLANK_ANSWERS = {"", "no answer", "n/a", "-"}
+MIN_ANSWER_TOKENS = 40
+
+# MinHash over word 3-gram shingles, with LSH banding to find candidates;
+# candidates are then confirmed by their exact Jaccard similarity.
+SHINGLE_WORDS = 3
+NUM_PERM = 32
+BANDS = 8
+_ROWS = NUM_PERM // BANDS
+# XOR with a random mask permutes the hash space; over well-mixed hashes
+# that is close enough to min-wise independent, and map() keeps it in C.
+_PERMUTATIONS = [random.Random(20240601 + i).getrandbits(32) for i in range(NUM_PERM)]
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    # An approximation, not a tokenizer count: ~CHARS_PER_TOKEN characters
+    # per token. Synthesis may run on any OpenRouter model, each with its own
+    # tokenizer, and this only sizes batches and caps answers, never bills.
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def max_answer_tokens() -> int:
+    return int(os.getenv("SYNTHESIS_MAX_ANSWER_TOKENS", "600"))
+
+
+def dedup_threshold() -> float:
+    # Jaccard similarity of shingles at which answers count as the same;
+    # 1 or more collapses exact (normalized) duplicates only.
+    return float(os.getenv("SYNTHESIS_DEDUP_THRESHOLD", "0.8"))
+
+
+def settings() -> dict:
+    # Part of the synthesis cache key: they change what the model sees.
+    return {"max_answer_tokens": max_answer_tokens(), "dedup_threshold": dedup_threshold()}
+
+
+def _shingles(words: list[str]) -> set[str]:
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _signature(shingles: set[str]) -> tuple:
+    # crc32 rather than hash(): the same responses compact the same way in
+    # every worker.
+    hashes = [zlib.crc32(s.encode()) for s in shingles]
+    return tuple(min(map(mask.__xor__, hashes)) for mask in _PERMUTATIONS)
+
+
+class _Answer:
+    __slots__ = ("text", "count", "shingles")
+
+    def __init__(self, text: str, shingles: set[str]):
+        self.text = text
+        self.count = 1
+        self.shingles = shingles
+
+
+class _QuestionIndex:
+    # Canonical answers given so far to one question.
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.exact: dict[str, _Answer] = {}
+        self.buckets: dict[tuple, list[_Answer]] = {}
+
+    def add(self, text: str, compare_chars: int):
+        # Returns (answer, None) for a new answer, or (canonical, kind) with
+        # kind "exact" or "near" for a duplicate, whose count goes up. Only
+        # the first compare_chars count for near duplicates: past that the
+        # answer is truncated anyway.
+        words = _WORD.findall(text.lower())
+        key = " ".join(words)
+        if key in self.exact:
+            canonical = self.exact[key]
+            canonical.count += 1
+            return canonical, "exact"
+
+        shingles = _shingles(_WORD.findall(text[:compare_chars].lower()))
+        bands = []
+        if self.threshold < 1 and len(words) > SHINGLE_WORDS:
+            signature = _signature(shingles)
+            bands = [(i, signature[i * _ROWS:(i + 1) * _ROWS]) for i in range(BANDS)]
+            seen = set()
+            for band in bands:
+                for candidate in self.buckets.get(band, ()):
+                    if id(candidate) in seen:
+                        continue
+                    seen.add(id(candidate))
+                    overlap = len(shingles & candidate.shingles) / len(shingles | candidate.shingles)
+                    if overlap >= self.threshold:
+                        candidate.count += 1
+                        self.exact[key] = candidate
+                        return candidate, "near"
+
+        answer = _Answer(text, shingles)
+        self.exact[key] = answer
+        for band in bands:
+            self.buckets.setdefault(band, []).append(answer)
+        return answer, None
+
+
+def _truncate(text: str, tokens: int | None) -> tuple[str, bool]:
+    limit = None if tokens is None else tokens * CHARS_PER_TOKEN
+    if limit is None or len(text) <= limit:
+        return text, False
+    cut = text[:limit].rsplit(None, 1)[0] if " " in text[:limit] else text[:limit]
+    return f"{cut} … [truncated]", True
+
+
+def response_block(index: int, questions, answers: dict, label: str = "Response") -> str:
+    # Every answer verbatim; what compaction is measured against.
+    lines = [f"{label} {index}:"]
+    for q_idx, q_text in enumerate(questions, 1):
+        lines.append(f"  - Q: {q_text}")
+        lines.append(f"    A: {answers.get(f'q{q_idx}', 'No answer')}")
+    return "\n".join(lines)
+
+
+class CompactResponses:
+    # Responses in submission order, each reduced to the answers that still
+    # need saying: a duplicate answer stays with its first occurrence, and a
+    # response left with nothing is dropped.
+
+    def __init__(self, questions, responses, label: str = "Response"):
+        self.questions = list(questions)
+        self.label = label
+        indexes = [_QuestionIndex(dedup_threshold()) for _ in self.questions]
+        compare_chars = max_answer_tokens() * CHARS_PER_TOKEN
+        self.rows: list[list[tuple[int, _Answer]]] = []
+        self.stats = {
+            "responses": len(responses), "answers": 0, "blank": 0,
+            "exact_duplicates": 0, "near_duplicates": 0,
+        }
+        raw = []
+        for i, r in enumerate(responses, 1):
+            answers = r.answers or {}
+            raw.append(response_block(i, self.questions, answers, label))
+            row = []
+            for q_idx, index in enumerate(indexes):
+                text = str(answers.get(f"q{q_idx + 1}") or "").strip()
+                self.stats["answers"] += 1
+                if text.lower() in BLANK_ANSWERS or not _WORD.search(text):
+                    self.stats["blank"] += 1
+                    continue
+                answer, duplicate = index.add(text, compare_chars)
+                if duplicate:
+                    self.stats[f"{duplicate}_duplicates"] += 1
+                else:
+                    row.append((q_idx, answer))
+            if row:
+                self.rows.append(row)
+        self.tokens_before = sum(estimate_tokens(b) for b in raw)
+
+    def blocks(self, answer_tokens: int | None = None) -> list[str]:
+        answer_tokens = max_answer_tokens() if answer_tokens is None else answer_tokens
+        self.truncated = 0
+        blocks = []
+        for index, row in enumerate(self.rows, 1):
+            lines = [f"{self.label} {index}:"]
+            for q_idx, answer in row:
+                text, cut = _truncate(answer.text, answer_tokens)
+                self.truncated += cut
+                lines.append(f"  - Q: {self.questions[q_idx]}")
+                if answer.count > 1:
+                    lines.append(f"    A ({answer.count} participants): {text}")
+                else:
+                    lines.append(f"    A: {text}")
+            blocks.append("\n".join(lines))
+        return blocks
+
+    def blocks_within(self, budget: int) -> list[str]:
+        # Shortens the per-answer cap (not below MIN_ANSWER_TOKENS) until the
+        # blocks fit `budget` tokens, for prompts that must be sent in one go.
+        blocks = self.blocks()
+        if sum(estimate_tokens(b) for b in blocks) <= budget:
+            return blocks
+        low, high = MIN_ANSWER_TOKENS, max_answer_tokens()
+        while low < high:
+            middle = (low + high + 1) // 2
+            if sum(estimate_tokens(b) for b in self.blocks(middle)) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return self.blocks(low)
+
+    def report(self, blocks) -> dict:
+        tokens_after = sum(estimate_tokens(b) for b in blocks)
+        return {
+            **self.stats,
+            "responses_sent": len(self.rows),
+            "truncated": self.truncated,
+            "tokens_before": self.tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": max(self.tokens_before - tokens_after, 0),
+        }
+
+
+def merge_reports(*reports) -> dict:
+    merged = {}
+    for report in reports:
+        for key, value in report.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def record(report: dict, into: dict | None = None):
+    if into is not None:
+        into.update(report)
+    metrics.synthesis_prompt_tokens.inc(report["tokens_before"], kind="raw")
+    metrics.synthesis_prompt_tokens.inc(report["tokens_after"], kind="sent")
+    print(
+        f"Synthesis prompt: {report['tokens_before']} -> {report['tokens_after']} tokens "
+        f"({report['blank']} blank, {report['exact_duplicates']} exact and "
+        f"{report['near_duplicates']} near duplicates, {report['truncated']} truncated)"
+    )
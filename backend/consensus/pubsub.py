@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from .db import engine
+
+CHANNEL = "consensus_events"
+
+
+class InMemoryPubSub:
+    # Delivers events to the handlers of this process only. Used for tests,
+    # SQLite and single-worker runs; also the base for the other backends.
+
+    max_payload: int | None = None
+
+    def __init__(self):
+        self._handlers = []
+        self.started = False
+
+    def subscribe(self, handler):
+        # handler is an async callable taking the event dict
+        self._handlers.append(handler)
+
+    async def start(self):
+        self.started = True
+
+    async def stop(self):
+        self.started = False
+
+    async def publish(self, event: dict):
+        await self._dispatch(event)
+
+    async def _dispatch(self, event: dict):
+        for handler in list(self._handlers):
+            try:
+                await handler(event)
+            except Exception as e:
+                print(f"Pub/sub handler failed for {event.get('type')}: {e}")
+
+
+class PostgresPubSub(InMemoryPubSub):
+    # NOTIFY on publish, LISTEN on a dedicated connection per worker. Every
+    # worker, including the publisher, receives the event through LISTEN, so
+    # delivery looks the same wherever the request landed.
+
+    # Postgres rejects NOTIFY payloads of 8000 bytes or more.
+    max_payload = 7900
+
+    def __init__(self, channel: str = CHANNEL):
+        super().__init__()
+        self.channel = channel
+        self._conn = None
+        self._loop = None
+        self._reconnect = None
+
+    def _listen(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        url = engine.url.set(drivername="postgresql")
+        conn = psycopg2.connect(url.render_as_string(hide_password=False))
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._conn = await run_in_threadpool(self._listen)
+        self._loop.add_reader(self._conn.fileno(), self._on_readable)
+        self.started = True
+
+    async def stop(self):
+        self.started = False
+        if self._reconnect:
+            self._reconnect.cancel()
+        self._close()
+
+    def _close(self):
+        if self._conn is None:
+            return
+        try:
+            self._loop.remove_reader(self._conn.fileno())
+        except Exception:
+            pass
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            print(f"Pub/sub listener lost its connection: {e}")
+            self._close()
+            self._reconnect = self._loop.create_task(self._reconnect_loop())
+            return
+
+        while self._conn.notifies:
+            note = self._conn.notifies.pop(0)
+            try:
+                event = json.loads(note.payload)
+            except ValueError:
+                continue
+            self._loop.create_task(self._dispatch(event))
+
+    async def _reconnect_loop(self):
+        delay = 1.0
+        while self.started:
+            await asyncio.sleep(delay)
+            try:
+                self._conn = await run_in_threadpool(self._listen)
+            except Exception as e:
+                print(f"Pub/sub reconnect failed: {e}")
+                delay = min(delay * 2, 30.0)
+                continue
+            self._loop.add_reader(self._conn.fileno(), self._on_readable)
+            return
+
+    def _notify(self, payload: str):
+        with engine.begin() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": payload},
+            )
+
+    async def publish(self, event: dict):
+        if not self.started:
+            # Not listening (e.g. startup hooks never ran): nothing would come
+            # back to us through LISTEN, so deliver locally.
+            await self._dispatch(event)
+            return
+        await run_in_threadpool(self._notify, json.dumps(event))
+
+
+def make_pubsub():
+    backend = os.getenv("PUBSUB_BACKEND")
+    if backend is None:
+        backend = "postgres" if engine.dialect.name == "postgresql" else "memory"
+    if backend == "memory":
+        return InMemoryPubSub()
+    if backend == "postgres":
+        return PostgresPubSub()
+    raise RuntimeError(f"Unknown PUBSUB_BACKEND: {backend}")
+
+
+pubsub = make_pubsub()
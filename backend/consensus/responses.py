@@ -0,0 +1,75 @@
+from datetime import datetime
+from sqlalchemy import and_, exists, select, text, update
+from sqlalchemy.orm import Session
+
+from .models import ArchivedResponse, FormModel, Response
+
+
+def dialect_insert(db: Session):
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def upsert_responses(db: Session, rows: list[dict]):
+    # rows: dicts with form_id, user_id, round_id and answers. One statement
+    # per call: a resubmission overwrites the user's row for that round in
+    # place (keeping its id) and gets a fresh created_at.
+    if not rows:
+        return
+    now = datetime.utcnow()
+    rows = [{**row, "created_at": row.get("created_at") or now} for row in rows]
+
+    insert = dialect_insert(db)
+    if insert is None:
+        # No ON CONFLICT support known for this dialect: same effect, still
+        # inside the caller's transaction, one row at a time.
+        for row in rows:
+            updated = db.execute(
+                update(Response)
+                .where(Response.round_id == row["round_id"], Response.user_id == row["user_id"])
+                .values(answers=row["answers"], created_at=row["created_at"])
+            )
+            if not updated.rowcount:
+                db.execute(Response.__table__.insert().values(**row))
+        return
+
+    stmt = insert(Response).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[Response.round_id, Response.user_id],
+        set_={"answers": stmt.excluded.answers, "created_at": stmt.excluded.created_at},
+    ))
+
+
+def archive_responses(db: Session, rows: list[dict]):
+    # rows: dicts with form_id, user_id, email, round_id and answers.
+    if rows:
+        db.execute(ArchivedResponse.__table__.insert(), rows)
+
+
+def count_new_participant(db: Session, form_id: int, user_id: int):
+    # Bumps the dashboard counter only if this user has no response anywhere
+    # in the form yet, decided by the database in the same statement.
+    if db.get_bind().dialect.name == "postgresql":
+        # Concurrent first submissions by the same user would each see no
+        # response under READ COMMITTED; serialize them until commit.
+        # (SQLite already serializes writers.)
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:form_id, :user_id)"),
+            {"form_id": form_id, "user_id": user_id},
+        )
+    db.execute(
+        update(FormModel)
+        .where(
+            FormModel.id == form_id,
+            ~exists(select(Response.id).where(
+                and_(Response.form_id == form_id, Response.user_id == user_id)
+            )),
+        )
+        .values(participant_count=FormModel.participant_count + 1)
+    )
@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import FormModel, RoundModel
+from .pubsub import pubsub
+
+
+class ActiveRoundCache:
+    # form_id -> active round id, read from forms.active_round_id on a miss.
+    # Only forms that exist are cached. open_next_round and delete_form
+    # invalidate the form here and, through round_rollover / form_deleted
+    # events, on every other worker; the TTL bounds anything missed.
+
+    def __init__(self, bus=pubsub):
+        self._entries: dict[int, tuple[float, int | None]] = {}
+        self._lock = threading.Lock()
+        bus.subscribe(self._on_event)
+
+    def _ttl(self) -> float:
+        return float(os.getenv("ACTIVE_ROUND_CACHE_TTL", "60"))
+
+    def _cached(self, form_id: int):
+        # (hit, round_id)
+        with self._lock:
+            hit = self._entries.get(form_id)
+        if hit and hit[0] > time.monotonic():
+            return True, hit[1]
+        return False, None
+
+    def _store(self, form_id: int, round_id: int | None):
+        with self._lock:
+            self._entries[form_id] = (time.monotonic() + self._ttl(), round_id)
+
+    def get_id(self, db: Session, form_id: int) -> int | None:
+        hit, round_id = self._cached(form_id)
+        if not hit:
+            row = db.query(FormModel.active_round_id).filter(FormModel.id == form_id).first()
+            round_id = row.active_round_id if row else None
+            if row:
+                self._store(form_id, round_id)
+        return round_id
+
+    def get(self, db: Session, form_id: int) -> RoundModel | None:
+        round_id = self.get_id(db, form_id)
+        if round_id is None:
+            return None
+        return db.get(RoundModel, round_id)
+
+    async def aget_id(self, db: AsyncSession, form_id: int) -> int | None:
+        hit, round_id = self._cached(form_id)
+        if not hit:
+            row = (await db.execute(select(FormModel.active_round_id).where(FormModel.id == form_id))).first()
+            round_id = row.active_round_id if row else None
+            if row:
+                self._store(form_id, round_id)
+        return round_id
+
+    async def aget(self, db: AsyncSession, form_id: int) -> RoundModel | None:
+        round_id = await self.aget_id(db, form_id)
+        if round_id is None:
+            return None
+        return await db.get(RoundModel, round_id)
+
+    def invalidate(self, form_id: int):
+        with self._lock:
+            self._entries.pop(form_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    async def _on_event(self, event: dict):
+        if event.get("type") in ("round_rollover", "form_deleted") and event.get("form_id") is not None:
+            self.invalidate(event["form_id"])
+
+
+active_rounds = ActiveRoundCache()
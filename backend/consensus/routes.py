@@ -1,22 +1,40 @@
+from anyio import from_thread
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, Form, HTTPException
+from fastapi import APIRouter, Depends, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from pydantic import BaseModel, EmailStr, Field
+from datetime import datetime
 from email.message import EmailMessage
-from openai import OpenAI
-import aiosmtplib
+from typing import Literal
 import json
 import os
 
+from . import llm, metrics, prompt_builder, synthesis
+from .db import SessionLocal, pool_stats
+from .synthesis_cache import cache_key, synthesis_cache
+from .synthesis_checkpoints import load_checkpoint, save_checkpoint, split_since
+from .jobs import job_queue
+from .summaries import summary_store
+from .rounds import active_rounds
+from .responses import archive_responses, count_new_participant, upsert_responses
+from .pubsub import pubsub
+from .export import EXPORT_FORMATS, stream_export
+from .ingest import INGEST_FORMATS, IngestError, decode_lines, ingest_responses
 from .models import User, Response, ArchivedResponse, Feedback, FormModel, RoundModel, UserFormUnlock
+from .passwords import hash_password_async, invite_matches, is_usable, verify_and_update_async
 from .auth import (
     get_db,
-    get_password_hash,
-    verify_password,
+    get_async_db,
     create_access_token,
     get_current_user,
     get_current_admin_user,
+    get_token_user,
+    publish_user_invalidation,
 )
 from consensus.ws import ws_manager
 
@@ -25,10 +43,6 @@ load_dotenv()
 
 router = APIRouter()
 
-client = OpenAI(
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-    base_url="https://openrouter.ai/api/v1"
-)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
@@ -36,33 +50,60 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 # USER AUTH
 # ---------------------------------------------------------
 
+async def _user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email))
+
+
+# bcrypt runs in the password pool (consensus.passwords) and the database
+# through the async session, so neither ties up the request threadpool.
+
 @router.post("/register")
-def register(
+async def register(
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db),
+    invite_token: str | None = Form(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    if db.query(User).filter(User.email == email).first():
+    existing = await _user_by_email(db, email)
+    if existing and (
+        is_usable(existing.hashed_password) or not invite_matches(invite_token, existing.reset_token)
+    ):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed = get_password_hash(password)
-    user = User(email=email, hashed_password=hashed)
-    db.add(user)
-    db.commit()
+    hashed = await hash_password_async(password)
+    if existing:
+        # Imported without a password: the invite token from the import
+        # claims the account and the responses already recorded for it.
+        existing.hashed_password = hashed
+        existing.reset_token = None
+    else:
+        db.add(User(email=email, hashed_password=hashed))
+    await db.commit()
+    if existing:
+        await publish_user_invalidation(user_id=existing.id, email=email)
     return {"message": "Registered successfully"}
 
 
 @router.post("/login")
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await _user_by_email(db, form_data.username)
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    valid, new_hash = await verify_and_update_async(form_data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made
+        user.hashed_password = new_hash
+        await db.commit()
+
     token = create_access_token(
-        data={"sub": str(user.id), "is_admin": user.is_admin}
+        data={"sub": str(user.id), "is_admin": user.is_admin, "email": user.email}
     )
 
     return {
@@ -74,7 +115,7 @@ def login(
 
 
 @router.get("/me")
-def me(user: User = Depends(get_current_user)):
+def me(user: User = Depends(get_token_user)):
     return {"email": user.email, "is_admin": user.is_admin}
 
 
@@ -89,42 +130,30 @@ def submit_response(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    active_round = (
-        db.query(RoundModel)
-        .filter(RoundModel.form_id == form_id, RoundModel.is_active == True)
-        .first()
-    )
+    metrics.tag_form(form_id)
+    active_round_id = active_rounds.get_id(db, form_id)
 
-    if not active_round:
+    if not active_round_id:
         raise HTTPException(status_code=400, detail="No active round")
 
-    # Check if user has already submitted for this round, and delete old response if so
-    existing_response = db.query(Response).filter(
-        Response.user_id == user.id,
-        Response.round_id == active_round.id
-    ).first()
-    if existing_response:
-        db.delete(existing_response)
-        db.commit()
-
     data = json.loads(answers)
 
-    new = Response(
-        form_id=form_id,
-        user_id=user.id,
-        round_id=active_round.id,
-        answers=data,
-    )
-    db.add(new)
-
-    archive = ArchivedResponse(
-        form_id=form_id,
-        user_id=user.id,
-        email=user.email,
-        answers=data,
-        round_id=active_round.id,
-    )
-    db.add(archive)
+    # One transaction: counter, upsert of the round's response, archive row.
+    # The counter goes first so it still sees whether the user had answered.
+    count_new_participant(db, form_id, user.id)
+    upsert_responses(db, [{
+        "form_id": form_id,
+        "user_id": user.id,
+        "round_id": active_round_id,
+        "answers": data,
+    }])
+    archive_responses(db, [{
+        "form_id": form_id,
+        "user_id": user.id,
+        "email": user.email,
+        "answers": data,
+        "round_id": active_round_id,
+    }])
 
     db.commit()
     return {"ok": True}
@@ -134,19 +163,15 @@ def submit_response(
 def has_submitted(
     form_id: int,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_token_user)
 ):
-    active_round = (
-        db.query(RoundModel)
-        .filter(RoundModel.form_id == form_id, RoundModel.is_active == True)
-        .first()
-    )
-    if not active_round:
+    active_round_id = active_rounds.get_id(db, form_id)
+    if not active_round_id:
         return {"submitted": False}
 
     r = db.query(Response).filter(
         Response.user_id == user.id,
-        Response.round_id == active_round.id
+        Response.round_id == active_round_id
     ).first()
     return {"submitted": bool(r)}
 
@@ -155,19 +180,15 @@ def has_submitted(
 def get_my_response(
     form_id: int,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_token_user)
 ):
-    active_round = (
-        db.query(RoundModel)
-        .filter(RoundModel.form_id == form_id, RoundModel.is_active == True)
-        .first()
-    )
-    if not active_round:
+    active_round_id = active_rounds.get_id(db, form_id)
+    if not active_round_id:
         raise HTTPException(status_code=404, detail="No active round")
 
     response = db.query(Response).filter(
         Response.user_id == user.id,
-        Response.round_id == active_round.id
+        Response.round_id == active_round_id
     ).first()
 
     if not response:
@@ -185,6 +206,9 @@ class FeedbackPayload(BaseModel):
     influence: str
     furtherThoughts: str
     usability: str
+    # The form whose summary the feedback is about; without it the most
+    # recently pushed summary, of any form, is recorded.
+    form_id: int | None = None
 
 
 @router.post("/submit_feedback")
@@ -193,11 +217,10 @@ def submit_feedback(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user)
 ):
-    try:
-        with open("summary_cache.txt") as f:
-            summary_html = f.read().strip()
-    except FileNotFoundError:
-        summary_html = ""
+    if feedback.form_id is not None:
+        summary_html = summary_store.get(db, feedback.form_id)
+    else:
+        summary_html = summary_store.latest(db)
 
     entry = Feedback(
         accuracy=feedback.accuracy,
@@ -208,7 +231,9 @@ def submit_feedback(
         user_id=user.id
     )
     db.add(entry)
-    user.has_submitted_feedback = True
+    db.query(User).filter(User.id == user.id).update(
+        {User.has_submitted_feedback: True}, synchronize_session=False
+    )
     db.commit()
     return {"message": "Feedback saved"}
 
@@ -218,7 +243,7 @@ def all_feedback(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_admin_user)
 ):
-    f = db.query(Feedback).order_by(Feedback.created_at.desc()).all()
+    f = db.query(Feedback).options(joinedload(Feedback.user)).order_by(Feedback.created_at.desc()).all()
 
     return [
         {
@@ -246,47 +271,42 @@ class SummaryPayload(BaseModel):
 async def push_summary(
     form_id: int,
     payload: SummaryPayload,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_admin_user)
 ):
     summary = payload.summary.strip()
 
-    active_round = (
-        db.query(RoundModel)
-        .filter(RoundModel.form_id == form_id, RoundModel.is_active == True)
-        .first()
-    )
+    active_round = await active_rounds.aget(db, form_id)
 
     if not active_round:
         raise HTTPException(status_code=400, detail="No active round")
 
     active_round.synthesis = summary
-    db.commit()
+    active_round.synthesis_updated_at = datetime.utcnow()
+    await db.commit()
 
-    with open("summary_cache.txt", "w") as f:
-        f.write(summary)
+    summary_store.set(form_id, active_round.id, summary)
 
-    await ws_manager.broadcast_summary(summary)
+    await ws_manager.broadcast_summary(summary, form_id=form_id, round_id=active_round.id)
 
     return {"detail": "Summary pushed"}
 
 
 class GenerateSummaryPayload(BaseModel):
     model: str
+    stream: bool = False
+    # "auto" switches to map-reduce only when one prompt would be too large
+    mode: Literal["auto", "single", "map_reduce"] = "auto"
+    batch_tokens: int | None = Field(default=None, ge=500)
+    concurrency: int | None = Field(default=None, ge=1, le=32)
+    # Skip the synthesis cache and always call the model
+    force: bool = False
+    # Update the round's last synthesis with only the responses submitted since
+    incremental: bool = False
 
 
-@router.post("/forms/{form_id}/generate_summary")
-def generate_summary(
-    form_id: int,
-    payload: GenerateSummaryPayload,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_admin_user)
-):
-    active_round = (
-        db.query(RoundModel)
-        .filter(RoundModel.form_id == form_id, RoundModel.is_active == True)
-        .first()
-    )
+async def _load_synthesis_input(db: AsyncSession, form_id: int):
+    active_round = await active_rounds.aget(db, form_id)
 
     if not active_round:
         raise HTTPException(status_code=400, detail="No active round")
@@ -294,7 +314,7 @@ def generate_summary(
     # Fetch questions for the active round
     questions = active_round.questions or []
     if not questions:
-        form = db.query(FormModel).filter(FormModel.id == form_id).first()
+        form = await db.get(FormModel, form_id)
         if form:
             questions = form.questions or []
 
@@ -302,52 +322,206 @@ def generate_summary(
         raise HTTPException(status_code=400, detail="No questions found for this round")
 
     # Fetch responses for the active round
-    responses = (
-        db.query(Response)
-        .filter(Response.round_id == active_round.id)
+    responses = (await db.scalars(
+        select(Response)
+        .where(Response.round_id == active_round.id)
         .order_by(Response.created_at.asc())
-        .all()
-    )
+    )).all()
 
     if not responses:
         raise HTTPException(status_code=404, detail="No responses to summarize")
 
-    # Prepare the content for the LLM
-    prompt_content = "Please synthesize the following responses to the questions that were asked.\n\n"
-    prompt_content += "Questions:\n"
-    for i, q in enumerate(questions, 1):
-        prompt_content += f"{i}. {q}\n"
-    
-    prompt_content += "\n--- Responses ---\n"
+    return questions, responses
+
 
-    for i, r in enumerate(responses, 1):
-        prompt_content += f"\nResponse {i}:\n"
-        for q_idx, q_text in enumerate(questions, 1):
-            answer = r.answers.get(f'q{q_idx}', 'No answer')
-            prompt_content += f"  - Q: {q_text}\n"
-            prompt_content += f"    A: {answer}\n"
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
-    prompt_content += "\n--- End of Responses ---\n"
-    prompt_content += "\nNow, please provide a concise synthesis of all the answers."
 
+def _remember_summary(key: str, model: str, summary: str, responses):
+    synthesis_cache.put(key, model, summary)
+    save_checkpoint(responses[0].round_id, model, summary, responses)
+
+
+async def _stream_summary(model: str, prompt: str, key: str, responses, prompt_stats: dict):
+    parts = []
     try:
-        completion = client.chat.completions.create(
-            model=payload.model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert at synthesizing and summarizing responses.",
-                },
-                {"role": "user", "content": prompt_content},
-            ],
+        async for delta in llm.stream(model, prompt):
+            parts.append(delta)
+            yield _sse({"delta": delta})
+    except Exception as e:
+        print(f"Error streaming from OpenRouter: {e}")
+        yield _sse({"detail": f"Failed to generate summary: {e}"}, event="error")
+        return
+
+    summary = "".join(parts)
+    await run_in_threadpool(_remember_summary, key, model, summary, responses)
+    yield _sse({"summary": summary, "cached": False, "prompt_stats": prompt_stats}, event="done")
+
+
+async def _stream_cached(summary: str):
+    yield _sse({"delta": summary})
+    yield _sse({"summary": summary, "cached": True}, event="done")
+
+
+def _summary_stream(body):
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _synthesis_key(payload: GenerateSummaryPayload, questions, responses) -> str:
+    return cache_key(
+        payload.model,
+        questions,
+        responses,
+        mode=payload.mode,
+        batch_tokens=payload.batch_tokens,
+        # An incremental update is not what a full synthesis would produce.
+        incremental=payload.incremental,
+        prompt=prompt_builder.settings(),
+    )
+
+
+async def _prepare_synthesis(payload: GenerateSummaryPayload, questions, responses, key: str, progress=None,
+                             stats: dict | None = None):
+    # Returns (summary, None) when an existing synthesis can be reused as is,
+    # otherwise (None, prompt) for the model call. `stats` receives what
+    # compacting the responses saved in building the prompt.
+    if not payload.force:
+        cached = await run_in_threadpool(synthesis_cache.get, key)
+        if cached is not None:
+            return cached, None
+
+    options = {
+        "mode": payload.mode,
+        "batch_tokens": payload.batch_tokens,
+        "concurrency": payload.concurrency,
+        "progress": progress,
+        "stats": stats,
+    }
+    checkpoint = None
+    if payload.incremental:
+        checkpoint = await run_in_threadpool(load_checkpoint, responses[0].round_id, payload.model)
+
+    if checkpoint:
+        new, revised = split_since(checkpoint, responses)
+        if not new and not revised:
+            return checkpoint.summary, None
+        prompt = await synthesis.prepare_update_prompt(
+            payload.model, questions, responses, checkpoint.summary, new, revised, **options
         )
-        summary = completion.choices[0].message.content
-        return {"summary": summary}
+    else:
+        prompt = await synthesis.prepare_prompt(payload.model, questions, responses, **options)
+    return None, prompt
+
+
+async def _synthesize(payload: GenerateSummaryPayload, questions, responses, progress=None, stats=None):
+    key = _synthesis_key(payload, questions, responses)
+    summary, prompt = await _prepare_synthesis(payload, questions, responses, key, progress, stats)
+    if summary is not None:
+        return summary, True
+
+    summary = await llm.complete(payload.model, prompt)
+    await run_in_threadpool(_remember_summary, key, payload.model, summary, responses)
+    return summary, False
+
+
+@router.post("/forms/{form_id}/generate_summary")
+async def generate_summary(
+    form_id: int,
+    payload: GenerateSummaryPayload,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_admin_user)
+):
+    questions, responses = await _load_synthesis_input(db, form_id)
+    stats = {}
+
+    if payload.stream:
+        key = _synthesis_key(payload, questions, responses)
+        try:
+            summary, prompt_content = await _prepare_synthesis(payload, questions, responses, key, stats=stats)
+        except Exception as e:
+            print(f"Error calling OpenRouter: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to generate summary: {e}")
+
+        if summary is not None:
+            return _summary_stream(_stream_cached(summary))
+        return _summary_stream(_stream_summary(payload.model, prompt_content, key, responses, stats))
+
+    try:
+        summary, cached = await _synthesize(payload, questions, responses, stats=stats)
     except Exception as e:
         # Log the error for debugging
         print(f"Error calling OpenRouter: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {e}")
 
+    # prompt_stats is empty when an existing synthesis was reused.
+    return {"summary": summary, "cached": cached, "prompt_stats": stats}
+
+
+def _job_view(job: dict):
+    return {
+        "id": job["id"],
+        "form_id": job["form_id"],
+        "round_id": job["round_id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"].isoformat() if job["created_at"] else None,
+        "updated_at": job["updated_at"].isoformat() if job["updated_at"] else None,
+    }
+
+
+@router.post("/forms/{form_id}/synthesis_jobs", status_code=202)
+async def submit_synthesis_job(
+    form_id: int,
+    payload: GenerateSummaryPayload,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_admin_user)
+):
+    questions, responses = await _load_synthesis_input(db, form_id)
+
+    async def run(progress):
+        summary, _ = await _synthesize(payload, questions, responses, progress)
+        return summary
+
+    # Identical requests for the same response set share one job.
+    job = await job_queue.submit(
+        _synthesis_key(payload, questions, responses),
+        run,
+        form_id=form_id,
+        round_id=responses[0].round_id,
+        params=payload.model_dump(exclude={"stream"}),
+    )
+    return _job_view(job)
+
+
+@router.get("/synthesis_jobs/{job_id}")
+async def get_synthesis_job(
+    job_id: str,
+    user: User = Depends(get_current_admin_user)
+):
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_view(job)
+
+
+@router.post("/synthesis_jobs/{job_id}/cancel")
+async def cancel_synthesis_job(
+    job_id: str,
+    user: User = Depends(get_current_admin_user)
+):
+    job = await job_queue.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_view(job)
+
 
 
 # ---------------------------------------------------------
@@ -389,7 +563,10 @@ def create_form(
         questions=payload.questions
     )
     db.add(first_round)
+    db.flush()
+    f.active_round_id = first_round.id
     db.commit()
+    active_rounds.invalidate(f.id)
 
     return {
         "id": f.id,
@@ -432,36 +609,44 @@ def delete_form(
 
     db.delete(f)
     db.commit()
+
+    active_rounds.invalidate(form_id)
+    summary_store.invalidate(form_id)
+    from_thread.run(pubsub.publish, {"type": "form_deleted", "form_id": form_id})
     return {"status": "deleted"}
 
 
 @router.get("/forms")
 def get_forms(
+    limit: int | None = None,
+    offset: int = 0,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_admin_user)
 ):
-    items = db.query(FormModel).order_by(FormModel.id).all()
+    # One query for the whole dashboard: participant counts are maintained on
+    # the form row by submit_response, and the active round is joined in.
+    q = (
+        db.query(FormModel, RoundModel.round_number)
+        .outerjoin(RoundModel, RoundModel.id == FormModel.active_round_id)
+        .order_by(FormModel.id)
+    )
+    if offset:
+        q = q.offset(offset)
+    if limit is not None:
+        q = q.limit(limit)
 
-    result = []
-    for f in items:
-        participant_count = db.query(Response.user_id).filter(Response.form_id == f.id).distinct().count()
-        
-        active_round = db.query(RoundModel).filter(
-            RoundModel.form_id == f.id,
-            RoundModel.is_active == True
-        ).first()
-        
-        result.append({
+    return [
+        {
             "id": f.id,
             "title": f.title,
             "questions": f.questions,
             "allow_join": f.allow_join,
             "join_code": f.join_code,
-            "participant_count": participant_count,
-            "current_round": active_round.round_number if active_round else 0
-        })
-
-    return result
+            "participant_count": f.participant_count or 0,
+            "current_round": round_number or 0
+        }
+        for f, round_number in q.all()
+    ]
 
 
 class UnlockFormPayload(BaseModel):
@@ -502,7 +687,7 @@ def unlock_form(
 @router.get("/my_forms")
 def get_my_forms(
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_token_user)
 ):
     unlocked_forms = db.query(FormModel).join(UserFormUnlock).filter(UserFormUnlock.user_id == user.id).order_by(FormModel.id).all()
     return unlocked_forms
@@ -512,7 +697,7 @@ def get_my_forms(
 def get_form(
     form_id: int,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_token_user)
 ):
     f = db.query(FormModel).filter(FormModel.id == form_id).first()
     if not f:
@@ -539,13 +724,9 @@ class RoundConfig(BaseModel):
 def get_active_round(
     form_id: int,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_token_user)
 ):
-    active = (
-        db.query(RoundModel)
-        .filter(RoundModel.form_id == form_id, RoundModel.is_active == True)
-        .first()
-    )
+    active = active_rounds.get(db, form_id)
     if not active:
         raise HTTPException(status_code=404, detail="No active round")
 
@@ -576,14 +757,17 @@ def open_next_round(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_admin_user)
 ):
-    current = (
-        db.query(RoundModel)
-        .filter(RoundModel.form_id == form_id, RoundModel.is_active == True)
-        .first()
-    )
+    # Locking the form row serializes concurrent rollovers of the same form;
+    # the flag flip, the new round and the form's pointer commit together.
+    form = db.query(FormModel).filter(FormModel.id == form_id).with_for_update().first()
+    if not form:
+        raise HTTPException(status_code=404, detail="Form not found")
 
-    if current:
-        current.is_active = False
+    db.query(RoundModel).filter(
+        RoundModel.form_id == form_id,
+        RoundModel.is_active == True
+    ).update({RoundModel.is_active: False}, synchronize_session=False)
+    db.flush()
 
     last = (
         db.query(RoundModel)
@@ -594,7 +778,6 @@ def open_next_round(
 
     next_number = (last.round_number + 1) if last else 1
 
-    form = db.query(FormModel).filter(FormModel.id == form_id).first()
     base = form.questions or []
 
     if payload and payload.questions:
@@ -614,9 +797,15 @@ def open_next_round(
         synthesis=previous_synthesis
     )
     db.add(new)
+    db.flush()
+    form.active_round_id = new.id
     db.commit()
     db.refresh(new)
 
+    active_rounds.invalidate(form_id)
+    summary_store.invalidate(form_id)
+    from_thread.run(pubsub.publish, {"type": "round_rollover", "form_id": form_id, "round_id": new.id})
+
     return {
         "id": new.id,
         "round_number": new.round_number,
@@ -629,7 +818,7 @@ def open_next_round(
 def get_rounds(
     form_id: int,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_token_user)
 ):
     rounds = (
         db.query(RoundModel)
@@ -661,16 +850,12 @@ def form_responses(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_admin_user)
 ):
-    q = db.query(Response).filter(Response.form_id == form_id)
+    q = db.query(Response).options(joinedload(Response.user)).filter(Response.form_id == form_id)
 
     if not all_rounds:
-        active = (
-            db.query(RoundModel)
-            .filter(RoundModel.form_id == form_id, RoundModel.is_active == True)
-            .first()
-        )
-        if active:
-            q = q.filter(Response.round_id == active.id)
+        active_round_id = active_rounds.get_id(db, form_id)
+        if active_round_id:
+            q = q.filter(Response.round_id == active_round_id)
 
     items = q.order_by(Response.created_at.asc()).all()
 
@@ -709,44 +894,175 @@ def form_archived(
     ]
 
 
-@router.get("/forms/{form_id}/rounds_with_responses")
-def rounds_with_responses(
+def _export_response(fmt: str, build_query, created_col, id_col, filename: str):
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+
+    return StreamingResponse(
+        stream_export(build_query, created_col, id_col, fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+@router.get("/form/{form_id}/responses/export")
+def export_responses(
     form_id: int,
+    format: str = "ndjson",
+    all_rounds: bool = False,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_admin_user)
 ):
-    rounds = (
-        db.query(RoundModel)
-        .filter(RoundModel.form_id == form_id)
-        .order_by(RoundModel.round_number.asc())
-        .all()
+    round_id = None
+    if not all_rounds:
+        round_id = active_rounds.get_id(db, form_id)
+
+    def build_query(export_db):
+        q = (
+            export_db.query(
+                Response.id,
+                Response.round_id,
+                Response.answers,
+                Response.created_at,
+                User.email,
+            )
+            .outerjoin(User, User.id == Response.user_id)
+            .filter(Response.form_id == form_id)
+        )
+        if round_id is not None:
+            q = q.filter(Response.round_id == round_id)
+        return q
+
+    return _export_response(
+        format, build_query, Response.created_at, Response.id,
+        f"form-{form_id}-responses",
+    )
+
+
+@router.get("/form/{form_id}/archived_responses/export")
+def export_archived_responses(
+    form_id: int,
+    format: str = "ndjson",
+    user: User = Depends(get_current_admin_user)
+):
+    def build_query(export_db):
+        return export_db.query(
+            ArchivedResponse.id,
+            ArchivedResponse.round_id,
+            ArchivedResponse.answers,
+            ArchivedResponse.created_at,
+            ArchivedResponse.email,
+        ).filter(ArchivedResponse.form_id == form_id)
+
+    return _export_response(
+        format, build_query, ArchivedResponse.created_at, ArchivedResponse.id,
+        f"form-{form_id}-archived-responses",
     )
 
-    output = []
-    for r in rounds:
-        rs = (
-            db.query(Response)
-            .filter(Response.round_id == r.id)
-            .order_by(Response.created_at.asc())
+
+def _upload_lines(request: Request):
+    # The upload as text lines, pulled from the event loop chunk by chunk by
+    # the worker thread that consumes it; nothing is buffered beyond a chunk.
+    chunks = request.stream()
+
+    async def next_chunk():
+        try:
+            return await chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def read():
+        while (chunk := from_thread.run(next_chunk)) is not None:
+            yield chunk
+
+    return decode_lines(read())
+
+
+@router.post("/forms/{form_id}/responses/import")
+async def import_responses(
+    form_id: int,
+    request: Request,
+    format: str = "ndjson",
+    round_id: int | None = None,
+    user: User = Depends(get_current_admin_user)
+):
+    # NDJSON lines or CSV rows of {email, answers[, timestamp]} for one round
+    # (the active one unless round_id is given). Participants without an
+    # account get one, claimed by registering with the invite token returned
+    # for their email.
+    if format not in INGEST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+
+    try:
+        result = await run_in_threadpool(
+            ingest_responses, form_id, round_id, format, _upload_lines(request)
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IngestError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+
+    return result
+
+
+def _stream_rounds_with_responses(form_id: int):
+    # Runs after the request's session is gone, so it owns one. Two queries in
+    # total: the rounds, then every response of the form (with the author's
+    # email joined in) streamed in round order and merged into the output.
+    with SessionLocal() as db:
+        rounds = (
+            db.query(RoundModel)
+            .filter(RoundModel.form_id == form_id)
+            .order_by(RoundModel.round_number.asc(), RoundModel.id.asc())
             .all()
         )
 
-        output.append({
-            "id": r.id,
-            "round_number": r.round_number,
-            "synthesis": r.synthesis,
-            "is_active": r.is_active,
-            "responses": [
-                {
-                    "answers": x.answers,
-                    "email": x.user.email if x.user else None,
-                    "timestamp": x.created_at.isoformat()
-                }
-                for x in rs
-            ]
-        })
+        rows = iter(
+            db.query(Response.round_id, Response.answers, Response.created_at, User.email)
+            .join(RoundModel, RoundModel.id == Response.round_id)
+            .outerjoin(User, User.id == Response.user_id)
+            .filter(RoundModel.form_id == form_id)
+            .order_by(RoundModel.round_number.asc(), RoundModel.id.asc(), Response.created_at.asc())
+            .execution_options(yield_per=500)
+        )
+        row = next(rows, None)
+
+        # Written piece by piece: each round's own fields, then its
+        # responses as they are read, so nothing holds the whole form.
+        yield "["
+        for i, r in enumerate(rounds):
+            fields = {
+                "id": r.id,
+                "round_number": r.round_number,
+                "synthesis": r.synthesis,
+                "is_active": r.is_active,
+            }
+            members = "".join(f"{json.dumps(k)}: {json.dumps(v)}, " for k, v in fields.items())
+            yield ("," if i else "") + "{" + members + '"responses": ['
+
+            first = True
+            while row is not None and row.round_id == r.id:
+                yield ("" if first else ",") + json.dumps({
+                    "answers": row.answers,
+                    "email": row.email,
+                    "timestamp": row.created_at.isoformat()
+                })
+                first = False
+                row = next(rows, None)
+
+            yield "]}"
+        yield "]"
 
-    return output
+
+@router.get("/forms/{form_id}/rounds_with_responses")
+def rounds_with_responses(
+    form_id: int,
+    user: User = Depends(get_current_admin_user)
+):
+    return StreamingResponse(
+        _stream_rounds_with_responses(form_id),
+        media_type="application/json",
+    )
 
 
 # ---------------------------------------------------------
@@ -759,18 +1075,14 @@ def synthesise_simple(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_admin_user)
 ):
-    active = (
-        db.query(RoundModel)
-        .filter(RoundModel.form_id == form_id, RoundModel.is_active == True)
-        .first()
-    )
+    active_round_id = active_rounds.get_id(db, form_id)
 
-    if not active:
+    if not active_round_id:
         raise HTTPException(status_code=400, detail="No active round")
 
     items = (
         db.query(Response)
-        .filter(Response.round_id == active.id)
+        .filter(Response.round_id == active_round_id)
         .order_by(Response.created_at.asc())
         .all()
     )
@@ -813,6 +1125,8 @@ async def send_email(
     # SMTP_PORT: The port of the SMTP server.
     # SMTP_USER: The username for the SMTP server.
     # SMTP_PASS: The password for the SMTP server.
+    import aiosmtplib  # only needed here; kept off the startup path
+
     msg = EmailMessage()
     msg["From"] = "info@colabintel.org"
     msg["To"] = to
@@ -820,15 +1134,27 @@ async def send_email(
     msg.set_content(html, subtype="html")
 
     try:
-        await aiosmtplib.send(
-            msg,
-            hostname=os.getenv("SMTP_HOST"),
-            port=int(os.getenv("SMTP_PORT", "587")),
-            start_tls=True,
-            username=os.getenv("SMTP_USER"),
-            password=os.getenv("SMTP_PASS")
-        )
+        with metrics.timed(metrics.smtp_duration):
+            await aiosmtplib.send(
+                msg,
+                hostname=os.getenv("SMTP_HOST"),
+                port=int(os.getenv("SMTP_PORT", "587")),
+                start_tls=True,
+                username=os.getenv("SMTP_USER"),
+                password=os.getenv("SMTP_PASS")
+            )
         return {"status": "sent"}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed: {str(e)}")
+
+
+# ---------------------------------------------------------
+# DIAGNOSTICS
+# ---------------------------------------------------------
+
+@router.get("/admin/db_pool")
+def db_pool_stats(user: User = Depends(get_current_admin_user)):
+    # This worker's connection pool: current occupancy plus a cumulative
+    # histogram of how long checkouts waited for a connection.
+    return pool_stats()
@@ -0,0 +1,19 @@
+import os
+from alembic import command
+from alembic.config import Config
+
+from .db import engine
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def alembic_config() -> Config:
+    return Config(ALEMBIC_INI)
+
+
+def upgrade_database(revision: str = "head"):
+    # Same effect as `alembic upgrade head` from backend/, on the app's engine.
+    cfg = alembic_config()
+    with engine.connect() as connection:
+        cfg.attributes["connection"] = connection
+        command.upgrade(cfg, revision)
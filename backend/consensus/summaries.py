@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from sqlalchemy.orm import Session
+
+from .models import RoundModel
+from .pubsub import pubsub
+from .rounds import active_rounds
+
+
+class SummaryStore:
+    # Latest pushed summary per form, read through from the active round's
+    # synthesis column. Every worker hears summary_updated events on the
+    # pub/sub bus, so pushes made elsewhere refresh this cache too, and
+    # round_rollover / form_deleted drop the form; the TTL bounds anything
+    # missed, as in ActiveRoundCache.
+
+    def __init__(self, bus=pubsub):
+        self._by_form: dict[int, tuple[float, int | None, str]] = {}
+        self._lock = threading.Lock()
+        bus.subscribe(self._on_event)
+
+    def _ttl(self) -> float:
+        return float(os.getenv("SUMMARY_CACHE_TTL", "60"))
+
+    def get(self, db: Session, form_id: int) -> str:
+        with self._lock:
+            hit = self._by_form.get(form_id)
+        if hit is not None and hit[0] > time.monotonic():
+            return hit[2]
+
+        active = active_rounds.get(db, form_id)
+        if not active:
+            return ""
+        summary = active.synthesis or ""
+        self.set(form_id, active.id, summary)
+        return summary
+
+    def latest(self, db: Session) -> str:
+        # The most recently pushed summary of any form, for callers that
+        # don't say which form they mean. Read from the rounds, so it is the
+        # same on every worker and survives restarts.
+        summary = (
+            db.query(RoundModel.synthesis)
+            .filter(RoundModel.synthesis_updated_at.isnot(None))
+            .order_by(RoundModel.synthesis_updated_at.desc())
+            .limit(1)
+            .scalar()
+        )
+        return summary or ""
+
+    def set(self, form_id: int, round_id: int | None, summary: str):
+        with self._lock:
+            self._by_form[form_id] = (time.monotonic() + self._ttl(), round_id, summary)
+
+    def invalidate(self, form_id: int):
+        with self._lock:
+            self._by_form.pop(form_id, None)
+
+    async def _on_event(self, event: dict):
+        if event.get("type") in ("round_rollover", "form_deleted") and event.get("form_id") is not None:
+            self.invalidate(event["form_id"])
+            return
+        if event.get("type") != "summary_updated" or event.get("form_id") is None:
+            return
+        if event.get("summary") is None:
+            # Oversized summaries travel by reference; reload on next read.
+            self.invalidate(event["form_id"])
+            return
+        self.set(event["form_id"], event.get("round_id"), event["summary"])
+
+
+summary_store = SummaryStore()
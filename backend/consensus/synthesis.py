@@ -0,0 +1,254 @@
+import asyncio
+import os
+
+from . import llm
+from .prompt_builder import CompactResponses, estimate_tokens, merge_reports, record
+
+# Bump whenever the prompt templates change so cached syntheses are not reused.
+PROMPT_VERSION = 2
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def default_batch_tokens() -> int:
+    return _env_int("SYNTHESIS_BATCH_TOKENS", 6000)
+
+
+def default_concurrency() -> int:
+    return _env_int("SYNTHESIS_CONCURRENCY", 4)
+
+
+def max_prompt_tokens() -> int:
+    return _env_int("SYNTHESIS_MAX_PROMPT_TOKENS", 24000)
+
+
+def _question_lines(questions):
+    return [f"{i}. {q}" for i, q in enumerate(questions, 1)]
+
+
+# Said wherever response blocks appear, as they come out of CompactResponses.
+COMPACTION_NOTE = ("Blank answers are left out, and answers given by several participants "
+                   "in identical or near-identical words appear once, with their number.")
+
+
+def build_prompt(questions, blocks) -> str:
+    lines = [
+        "Please synthesize the following responses to the questions that were asked.",
+        COMPACTION_NOTE,
+        "",
+        "Questions:",
+        *_question_lines(questions),
+        "",
+        "--- Responses ---",
+    ]
+    for block in blocks:
+        lines.append("")
+        lines.append(block)
+    lines += [
+        "",
+        "--- End of Responses ---",
+        "",
+        "Now, please provide a concise synthesis of all the answers.",
+    ]
+    return "\n".join(lines)
+
+
+def build_map_prompt(questions, blocks, batch_no: int, batch_count: int) -> str:
+    lines = [
+        f"The following is batch {batch_no} of {batch_count} of the responses to the questions below.",
+        "Summarize this batch faithfully: keep the distinct positions, how common each one is,",
+        "and any notable dissent. Another step will merge the batch summaries.",
+        COMPACTION_NOTE,
+        "",
+        "Questions:",
+        *_question_lines(questions),
+        "",
+        "--- Responses ---",
+    ]
+    for block in blocks:
+        lines.append("")
+        lines.append(block)
+    lines += ["", "--- End of Responses ---"]
+    return "\n".join(lines)
+
+
+def build_reduce_prompt(questions, partials, final: bool = True) -> str:
+    lines = [
+        "The responses to the questions below were summarized in separate batches.",
+        "",
+        "Questions:",
+        *_question_lines(questions),
+        "",
+        "--- Batch summaries ---",
+    ]
+    for i, partial in enumerate(partials, 1):
+        lines.append("")
+        lines.append(f"Batch summary {i}:")
+        lines.append(partial)
+    lines += ["", "--- End of batch summaries ---", ""]
+    if final:
+        lines.append("Now, please provide a concise synthesis of all the answers, "
+                     "weighting each position by how widely it was held.")
+    else:
+        lines.append("Merge these batch summaries into one summary, keeping the distinct "
+                     "positions, how common each one is, and any notable dissent.")
+    return "\n".join(lines)
+
+
+def build_update_prompt(questions, summary: str, new_blocks, revised_blocks) -> str:
+    lines = [
+        "Below is the current synthesis of the responses to the questions that were asked,",
+        "followed by responses submitted since it was written. Revised responses replace an",
+        "earlier answer from the same participant that is already reflected in the synthesis.",
+        COMPACTION_NOTE,
+        "",
+        "Questions:",
+        *_question_lines(questions),
+        "",
+        "--- Current synthesis ---",
+        summary,
+        "--- End of current synthesis ---",
+    ]
+    for title, blocks in (("New responses", new_blocks), ("Revised responses", revised_blocks)):
+        if not blocks:
+            continue
+        lines += ["", f"--- {title} ---"]
+        for block in blocks:
+            lines.append("")
+            lines.append(block)
+        lines += ["", f"--- End of {title.lower()} ---"]
+    lines += [
+        "",
+        "Now, please update the synthesis so that it reflects these responses as well. "
+        "Keep its structure, and return the complete updated synthesis.",
+    ]
+    return "\n".join(lines)
+
+
+def batch_by_tokens(items, budget: int):
+    # Greedy packing in submission order; an item larger than the budget gets
+    # a batch of its own rather than being split mid-answer.
+    batches, current, used = [], [], 0
+    for item in items:
+        cost = estimate_tokens(item)
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _gather_bounded(model: str, prompts, concurrency: int, on_done=None):
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(prompt):
+        async with semaphore:
+            result = await llm.complete(model, prompt)
+        if on_done:
+            on_done()
+        return result
+
+    return await asyncio.gather(*(run(p) for p in prompts))
+
+
+async def map_reduce_prompt(
+    model: str,
+    questions,
+    blocks,
+    batch_tokens: int,
+    concurrency: int,
+    progress=None,
+) -> str:
+    # Map every batch of responses to a partial summary, then keep merging
+    # partials in batches until they fit one prompt. The final reduce prompt
+    # is returned rather than sent so the caller can stream it.
+    batches = batch_by_tokens(blocks, batch_tokens)
+    done = 0
+
+    def batch_done():
+        # The map phase is most of the work; the last tenth is left for the
+        # reduce steps and the final completion.
+        nonlocal done
+        done += 1
+        if progress:
+            progress(0.9 * done / len(batches))
+
+    partials = await _gather_bounded(
+        model,
+        [build_map_prompt(questions, b, i, len(batches)) for i, b in enumerate(batches, 1)],
+        concurrency,
+        batch_done,
+    )
+
+    while len(partials) > 1 and estimate_tokens(build_reduce_prompt(questions, partials)) > batch_tokens:
+        groups = batch_by_tokens(partials, batch_tokens)
+        if len(groups) == len(partials):
+            # Each partial already fills a batch; merging can't shrink further.
+            break
+        partials = await _gather_bounded(
+            model,
+            [build_reduce_prompt(questions, g, final=False) for g in groups],
+            concurrency,
+        )
+
+    return build_reduce_prompt(questions, partials)
+
+
+async def prepare_prompt(
+    model: str,
+    questions,
+    responses,
+    mode: str = "auto",
+    batch_tokens: int | None = None,
+    concurrency: int | None = None,
+    progress=None,
+    stats: dict | None = None,
+) -> str:
+    # `stats`, if given, receives what compacting the responses saved.
+    compacted = await asyncio.to_thread(CompactResponses, questions, responses)
+    blocks = compacted.blocks()
+    prompt = build_prompt(questions, blocks)
+
+    if mode == "single" and estimate_tokens(prompt) > max_prompt_tokens():
+        # One prompt was asked for: cut long answers further until it fits.
+        blocks = compacted.blocks_within(max_prompt_tokens() - estimate_tokens(build_prompt(questions, [])))
+        prompt = build_prompt(questions, blocks)
+    record(compacted.report(blocks), stats)
+
+    if mode == "single" or (mode == "auto" and estimate_tokens(prompt) <= max_prompt_tokens()):
+        return prompt
+
+    return await map_reduce_prompt(
+        model,
+        questions,
+        blocks,
+        batch_tokens or default_batch_tokens(),
+        concurrency or default_concurrency(),
+        progress,
+    )
+
+
+async def prepare_update_prompt(
+    model: str,
+    questions,
+    responses,
+    summary: str,
+    new,
+    revised,
+    **options,
+) -> str:
+    # Folding only the delta into the previous synthesis is the point; if the
+    # delta alone is too big for one prompt, a full run is the better deal.
+    new = await asyncio.to_thread(CompactResponses, questions, new, "New response")
+    revised = await asyncio.to_thread(CompactResponses, questions, revised, "Revised response")
+    new_blocks, revised_blocks = new.blocks(), revised.blocks()
+    prompt = build_update_prompt(questions, summary, new_blocks, revised_blocks)
+    if estimate_tokens(prompt) <= max_prompt_tokens():
+        record(merge_reports(new.report(new_blocks), revised.report(revised_blocks)), options.get("stats"))
+        return prompt
+    return await prepare_prompt(model, questions, responses, **options)
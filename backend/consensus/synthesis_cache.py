@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+
+from .db import SessionLocal
+from .models import SynthesisCacheEntry
+from .synthesis import PROMPT_VERSION
+
+
+def _ttl_seconds() -> int:
+    return int(os.getenv("SYNTHESIS_CACHE_TTL", "86400"))
+
+
+def _max_entries() -> int:
+    return int(os.getenv("SYNTHESIS_CACHE_SIZE", "256"))
+
+
+def cache_key(model: str, questions, responses, **params) -> str:
+    # Anything that can change the model's output belongs in the key: the
+    # model, the questions, the exact response set in order, the prompt
+    # templates and the synthesis options.
+    material = {
+        "v": PROMPT_VERSION,
+        "model": model,
+        "questions": list(questions),
+        "responses": [[r.id, r.answers] for r in responses],
+        "params": params,
+    }
+    raw = json.dumps(material, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SynthesisCache:
+    # Per-process LRU in front of the synthesis_cache table, which is what
+    # makes a hit survive restarts and reach the other workers.
+
+    def __init__(self):
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, stored_at: float, summary: str):
+        with self._lock:
+            self._entries[key] = (stored_at, summary)
+            self._entries.move_to_end(key)
+            while len(self._entries) > _max_entries():
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> str | None:
+        ttl = _ttl_seconds()
+        now = time.time()
+
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit and now - hit[0] <= ttl:
+                self._entries.move_to_end(key)
+                return hit[1]
+            if hit:
+                del self._entries[key]
+
+        with SessionLocal() as db:
+            row = db.get(SynthesisCacheEntry, key)
+            if not row:
+                return None
+            if row.created_at < datetime.utcnow() - timedelta(seconds=ttl):
+                db.delete(row)
+                db.commit()
+                return None
+            stored_at = now - (datetime.utcnow() - row.created_at).total_seconds()
+            summary = row.summary
+
+        self._remember(key, stored_at, summary)
+        return summary
+
+    def put(self, key: str, model: str, summary: str):
+        self._remember(key, time.time(), summary)
+
+        cutoff = datetime.utcnow() - timedelta(seconds=_ttl_seconds())
+        with SessionLocal() as db:
+            db.query(SynthesisCacheEntry).filter(
+                SynthesisCacheEntry.created_at < cutoff
+            ).delete(synchronize_session=False)
+            db.merge(SynthesisCacheEntry(
+                key=key,
+                model=model,
+                summary=summary,
+                created_at=datetime.utcnow(),
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker stored the same key first; its entry is as good.
+                db.rollback()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+synthesis_cache = SynthesisCache()
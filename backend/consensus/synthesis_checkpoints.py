@@ -0,0 +1,45 @@
+from sqlalchemy.exc import IntegrityError
+
+from .db import SessionLocal
+from .models import SynthesisCheckpoint
+
+
+def load_checkpoint(round_id: int, model: str) -> SynthesisCheckpoint | None:
+    with SessionLocal() as db:
+        return db.get(SynthesisCheckpoint, (round_id, model))
+
+
+def save_checkpoint(round_id: int, model: str, summary: str, responses):
+    with SessionLocal() as db:
+        db.merge(SynthesisCheckpoint(
+            round_id=round_id,
+            model=model,
+            summary=summary,
+            high_water_mark=max(r.id for r in responses),
+            response_ids={str(r.user_id): r.id for r in responses},
+            response_versions={str(r.user_id): _version(r) for r in responses},
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent run saved its checkpoint first; either one is valid.
+            db.rollback()
+
+
+def _version(response) -> str | None:
+    return response.created_at.isoformat() if response.created_at else None
+
+
+def split_since(checkpoint: SynthesisCheckpoint, responses):
+    # A user missing from the checkpoint is new; a known user whose response
+    # row or timestamp differs has resubmitted since. Checkpoints written
+    # before versions were recorded treat every known user as revised.
+    versions = checkpoint.response_versions or {}
+    new, revised = [], []
+    for r in responses:
+        uid = str(r.user_id)
+        if uid not in checkpoint.response_ids:
+            new.append(r)
+        elif checkpoint.response_ids[uid] != r.id or versions.get(uid) != _version(r):
+            revised.append(r)
+    return new, revised
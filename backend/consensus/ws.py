@@ -1,25 +1,140 @@
+import asyncio
+import json
+import os
 from fastapi import WebSocket
-from typing import Set
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Optional, Set, Tuple
+
+from . import metrics
+from .db import SessionLocal
+from .models import RoundModel
+from .pubsub import pubsub
+
+# (form_id, round_id); None means "any", so (None, None) is the firehose that
+# unscoped sockets subscribe to.
+Topic = Tuple[Optional[int], Optional[int]]
+
+
+class Subscriber:
+    # Each socket gets its own bounded outbox and sender task, so a slow
+    # client only ever delays itself.
+
+    def __init__(self, websocket: WebSocket, topic: Topic, queue_size: int):
+        self.websocket = websocket
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.task: Optional[asyncio.Task] = None
+
+
+def _round_synthesis(round_id: Optional[int]) -> str:
+    if round_id is None:
+        return ""
+    with SessionLocal() as db:
+        r = db.get(RoundModel, round_id)
+        return (r.synthesis or "") if r else ""
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+    # Sockets are local to this worker; broadcasts go out through the pub/sub
+    # backbone so that every worker delivers them to its own sockets.
 
-    async def connect(self, websocket: WebSocket):
+    def __init__(self, bus=pubsub):
+        self.bus = bus
+        self.subscribers: Dict[WebSocket, Subscriber] = {}
+        self.topics: Dict[Topic, Set[Subscriber]] = {}
+        self.send_timeout = float(os.getenv("WS_SEND_TIMEOUT", "5"))
+        self.queue_size = int(os.getenv("WS_QUEUE_SIZE", "16"))
+        bus.subscribe(self._on_event)
+
+    @property
+    def active_connections(self) -> Set[WebSocket]:
+        return set(self.subscribers)
+
+    async def connect(self, websocket: WebSocket, form_id: Optional[int] = None, round_id: Optional[int] = None):
         await websocket.accept()
-        self.active_connections.add(websocket)
+        topic = (form_id, round_id if form_id is not None else None)
+        sub = Subscriber(websocket, topic, self.queue_size)
+        self.subscribers[websocket] = sub
+        self.topics.setdefault(topic, set()).add(sub)
+        sub.task = asyncio.create_task(self._sender(sub))
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.discard(websocket)
+        sub = self.subscribers.pop(websocket, None)
+        if not sub:
+            return
+        subs = self.topics.get(sub.topic)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self.topics[sub.topic]
+        if sub.task and sub.task is not asyncio.current_task():
+            sub.task.cancel()
+
+    async def _drop(self, sub: Subscriber):
+        metrics.ws_dropped.inc()
+        self.disconnect(sub.websocket)
+        try:
+            await sub.websocket.close(code=1013)
+        except Exception:
+            pass
+
+    async def _sender(self, sub: Subscriber):
+        while True:
+            message = await sub.queue.get()
+            try:
+                await asyncio.wait_for(sub.websocket.send_json(message), self.send_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await self._drop(sub)
+                return
+
+    def _recipients(self, form_id: Optional[int], round_id: Optional[int]):
+        topics = [(None, None)]
+        if form_id is not None:
+            topics.append((form_id, None))
+            if round_id is not None:
+                topics.append((form_id, round_id))
+        for topic in topics:
+            yield from list(self.topics.get(topic, ()))
 
-    async def broadcast_summary(self, summary: str):
-        for conn in self.active_connections.copy():
+    def publish(self, message: dict, form_id: Optional[int] = None, round_id: Optional[int] = None) -> int:
+        # Fan-out only enqueues; the per-socket sender tasks do the sending
+        # concurrently. A full outbox means the client stopped keeping up.
+        delivered = 0
+        for sub in self._recipients(form_id, round_id):
             try:
-                await conn.send_json({
-                    "type": "summary_updated",
-                    "summary": summary,
-                })
-            except:
-                self.disconnect(conn)
+                sub.queue.put_nowait(message)
+                delivered += 1
+            except asyncio.QueueFull:
+                asyncio.create_task(self._drop(sub))
+        return delivered
+
+    async def broadcast_summary(self, summary: str, form_id: Optional[int] = None, round_id: Optional[int] = None):
+        event = {
+            "type": "summary_updated",
+            "summary": summary,
+            "form_id": form_id,
+            "round_id": round_id,
+        }
+        limit = self.bus.max_payload
+        if limit is not None and len(json.dumps(event).encode("utf-8")) > limit:
+            # Too large to travel with the event; receivers read it back from
+            # the round, which push_summary has already committed.
+            event["summary"] = None
+        await self.bus.publish(event)
+
+    async def _on_event(self, event: dict):
+        if event.get("type") != "summary_updated":
+            return
+        summary = event.get("summary")
+        if summary is None:
+            summary = await run_in_threadpool(_round_synthesis, event.get("round_id"))
+        self.publish({
+            "type": "summary_updated",
+            "summary": summary,
+            "form_id": event.get("form_id"),
+            "round_id": event.get("round_id"),
+        }, form_id=event.get("form_id"), round_id=event.get("round_id"))
 
 ws_manager = ConnectionManager()
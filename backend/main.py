@@ -1,13 +1,42 @@
-import os
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from consensus import routes as consensus_routes
-from consensus.db import engine, SessionLocal
-from consensus.models import Base, User, UserFormUnlock
-from consensus.auth import get_password_hash
+from consensus import llm, metrics, profiling, routes as consensus_routes
+from consensus.auth import publish_user_invalidation
+from consensus.bootstrap import bootstrap
+from consensus.db import dispose_async_engine
+from consensus.jobs import job_queue
 from consensus.ws import ws_manager
+from consensus.pubsub import pubsub
+from consensus.passwords import shutdown_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema and admin account: one worker does it while the others wait.
+    admin_changed = await to_thread.run_sync(bootstrap)
+    await pubsub.start()
+    if admin_changed:
+        await publish_user_invalidation(email=admin_changed)
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await pubsub.stop()
+    shutdown_pool()
+    await dispose_async_engine()
+    await llm.aclose()
+    print("Shutting down cleanly")
+
+
+app = FastAPI(lifespan=lifespan)
+
+metrics.install_sqlalchemy_events()
+app.add_middleware(metrics.MetricsMiddleware)
 
-app = FastAPI()
+if profiling.enabled():
+    profiling.install_sqlalchemy_events()
+    app.add_middleware(profiling.QueryProfileMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,44 +47,15 @@ app.add_middleware(
 )
 
 app.include_router(consensus_routes.router)
-
-Base.metadata.create_all(bind=engine)
-
-with SessionLocal() as db:
-    admin_email = os.environ.get("ADMIN_EMAIL", "admin@example.com")
-    admin_password = os.environ.get("ADMIN_PASSWORD", "change-me-now")
-    admin = db.query(User).filter(User.email == admin_email).first()
-    if not admin:
-        db.add(User(
-            email=admin_email,
-            hashed_password=get_password_hash(admin_password),
-            is_admin=True
-        ))
-    else:
-        admin.is_admin = True
-        admin.hashed_password = get_password_hash(admin_password)
-
-    db.commit()
-
-    admin = db.query(User).filter(User.email == admin_email).first()
-    if not admin:
-        print("❌ Admin user not created")
-    else:
-        print("✅ Admin user exists:", admin.email)
-
-
+app.include_router(metrics.router)
 
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await ws_manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, form_id: int | None = None, round_id: int | None = None):
+    # Without a form_id the socket receives summaries for every form.
+    await ws_manager.connect(websocket, form_id=form_id, round_id=round_id)
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
         ws_manager.disconnect(websocket)
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    print("Shutting down cleanly")
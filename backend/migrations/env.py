@@ -0,0 +1,61 @@
+import os
+from logging.config import fileConfig
+
+from alembic import context
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from consensus.db import Base  # noqa: E402
+from consensus import models  # noqa: E402,F401  (registers the tables on Base)
+
+config = context.config
+
+# Only the alembic CLI configures logging; when main.py runs the upgrade the
+# application's own logging is left alone.
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    context.configure(
+        url=os.environ["DATABASE_URL"],
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run(connection):
+    # One transaction per revision, because index builds on Postgres commit
+    # whatever precedes them (see autocommit_block in the revisions).
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+
+    from consensus.db import engine
+    with engine.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
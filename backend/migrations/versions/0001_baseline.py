@@ -0,0 +1,164 @@
+"""Baseline: the schema main.py used to build with create_all
+
+Databases created before migrations existed already have some or all of
+these tables, so every step checks what is there first. Running this
+against such a database simply brings it level and records the revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def _columns(table):
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _create(name, *columns, indexes=()):
+    if name in _tables():
+        return
+    op.create_table(name, *columns)
+    for index_name, cols, unique in indexes:
+        op.create_index(index_name, name, cols, unique=unique)
+
+
+def upgrade():
+    _create(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_admin", sa.Boolean()),
+        sa.Column("has_submitted_feedback", sa.Boolean()),
+        sa.Column("reset_token", sa.String()),
+        indexes=[("ix_users_id", ["id"], False), ("ix_users_email", ["email"], True)],
+    )
+    _create(
+        "forms",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("questions", sa.JSON(), nullable=False),
+        sa.Column("allow_join", sa.Boolean()),
+        sa.Column("join_code", sa.String(), nullable=False, unique=True),
+        sa.Column("participant_count", sa.Integer(), nullable=False),
+        sa.Column("active_round_id", sa.Integer()),
+        indexes=[("ix_forms_id", ["id"], False)],
+    )
+    _create(
+        "user_form_unlocks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("form_id", sa.Integer(), sa.ForeignKey("forms.id"), nullable=False),
+        indexes=[("ix_user_form_unlocks_id", ["id"], False)],
+    )
+    _create(
+        "rounds",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("form_id", sa.Integer(), sa.ForeignKey("forms.id"), nullable=False),
+        sa.Column("round_number", sa.Integer(), nullable=False),
+        sa.Column("synthesis", sa.Text()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("questions", sa.JSON()),
+        indexes=[("ix_rounds_id", ["id"], False)],
+    )
+    _create(
+        "responses",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("form_id", sa.Integer(), sa.ForeignKey("forms.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("round_id", sa.Integer(), sa.ForeignKey("rounds.id"), nullable=False),
+        sa.Column("answers", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("ix_responses_id", ["id"], False)],
+    )
+    _create(
+        "archived_responses",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("form_id", sa.Integer(), sa.ForeignKey("forms.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("email", sa.String()),
+        sa.Column("answers", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("round_id", sa.Integer(), sa.ForeignKey("rounds.id")),
+        indexes=[("ix_archived_responses_id", ["id"], False)],
+    )
+    _create(
+        "feedback",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("accuracy", sa.Text()),
+        sa.Column("influence", sa.Text()),
+        sa.Column("further_thoughts", sa.Text()),
+        sa.Column("usability", sa.Text()),
+        sa.Column("summary", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        indexes=[("ix_feedback_id", ["id"], False)],
+    )
+    _create(
+        "synthesis_cache",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("ix_synthesis_cache_created_at", ["created_at"], False)],
+    )
+    _create(
+        "synthesis_checkpoints",
+        sa.Column("round_id", sa.Integer(), sa.ForeignKey("rounds.id"), primary_key=True),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("high_water_mark", sa.Integer(), nullable=False),
+        sa.Column("response_ids", sa.JSON(), nullable=False),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    _create(
+        "synthesis_jobs",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("form_id", sa.Integer(), nullable=False),
+        sa.Column("round_id", sa.Integer(), nullable=False),
+        sa.Column("dedupe_key", sa.String(64), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("progress", sa.Float(), nullable=False),
+        sa.Column("params", sa.JSON()),
+        sa.Column("result", sa.Text()),
+        sa.Column("error", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+        indexes=[("ix_synthesis_jobs_dedupe_key", ["dedupe_key"], False)],
+    )
+
+    # Columns main.py used to add by hand to forms tables that predate them.
+    form_columns = _columns("forms")
+    if "participant_count" not in form_columns:
+        op.add_column("forms", sa.Column("participant_count", sa.Integer(), nullable=False, server_default="0"))
+        op.execute(
+            "UPDATE forms SET participant_count = ("
+            "SELECT COUNT(DISTINCT responses.user_id) FROM responses "
+            "WHERE responses.form_id = forms.id)"
+        )
+    if "active_round_id" not in form_columns:
+        op.add_column("forms", sa.Column("active_round_id", sa.Integer()))
+        op.get_bind().execute(sa.text(
+            "UPDATE forms SET active_round_id = ("
+            "SELECT MAX(rounds.id) FROM rounds "
+            "WHERE rounds.form_id = forms.id AND rounds.is_active = :active)"
+        ), {"active": True})
+
+
+def downgrade():
+    for name in (
+        "synthesis_jobs", "synthesis_checkpoints", "synthesis_cache", "feedback",
+        "archived_responses", "responses", "rounds", "user_form_unlocks", "forms", "users",
+    ):
+        op.drop_table(name)
@@ -0,0 +1,88 @@
+"""Composite indexes for the response tables; one active round per form
+
+Duplicate (round_id, user_id) responses and forms with several active rounds
+would stop the unique indexes from building, so both are cleaned up first:
+the newest response and the newest active round win. Every submission is
+also in archived_responses, so dropping stale duplicates loses nothing.
+
+On Postgres the indexes are built CONCURRENTLY, outside a transaction, so
+responses keep being written while they build.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, options)
+INDEXES = [
+    ("ix_responses_form_id_created_at", "responses", ["form_id", "created_at"], {}),
+    ("uq_responses_round_id_user_id", "responses", ["round_id", "user_id"], {"unique": True}),
+    ("ix_archived_responses_form_id_created_at", "archived_responses", ["form_id", "created_at"], {}),
+    ("ix_rounds_form_id_is_active", "rounds", ["form_id", "is_active"], {}),
+    ("uq_rounds_one_active_per_form", "rounds", ["form_id"], {
+        "unique": True,
+        "postgresql_where": sa.text("is_active = true"),
+        "sqlite_where": sa.text("is_active = 1"),
+    }),
+]
+
+
+def _dedupe():
+    bind = op.get_bind()
+    bind.execute(sa.text(
+        "DELETE FROM responses WHERE id NOT IN ("
+        "SELECT MAX(id) FROM responses GROUP BY round_id, user_id)"
+    ))
+    bind.execute(sa.text(
+        "UPDATE rounds SET is_active = :inactive "
+        "WHERE is_active = :active AND id NOT IN ("
+        "SELECT MAX(id) FROM rounds WHERE is_active = :active GROUP BY form_id)"
+    ), {"active": True, "inactive": False})
+    bind.execute(sa.text(
+        "UPDATE forms SET active_round_id = ("
+        "SELECT MAX(rounds.id) FROM rounds "
+        "WHERE rounds.form_id = forms.id AND rounds.is_active = :active)"
+    ), {"active": True})
+
+
+def _index_exists(name, table):
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        # A CONCURRENTLY build that failed part-way leaves an INVALID index
+        # behind; drop it so this run can build it again.
+        valid = bind.execute(sa.text(
+            "SELECT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+        ), {"name": name}).scalar()
+        if valid is False:
+            with op.get_context().autocommit_block():
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+            return False
+        return valid is not None
+    return name in {i["name"] for i in sa.inspect(bind).get_indexes(table)}
+
+
+def upgrade():
+    _dedupe()
+
+    concurrent = op.get_bind().dialect.name == "postgresql"
+    for name, table, columns, options in INDEXES:
+        if _index_exists(name, table):
+            continue
+        if concurrent:
+            with op.get_context().autocommit_block():
+                op.create_index(name, table, columns, postgresql_concurrently=True, **options)
+        else:
+            op.create_index(name, table, columns, **options)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
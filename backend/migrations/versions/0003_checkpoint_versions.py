@@ -0,0 +1,25 @@
+"""Record per-user response versions on synthesis checkpoints
+
+Resubmissions now update the response row in place, so its id no longer
+changes; checkpoints keep the created_at they saw for each user instead.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("synthesis_checkpoints", sa.Column("response_versions", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("synthesis_checkpoints") as batch:
+        batch.drop_column("response_versions")
@@ -0,0 +1,27 @@
+"""Record when each round's synthesis was last pushed
+
+Feedback sent without a form_id records the most recently pushed summary;
+this is what finds it, on any worker and after restarts.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("rounds", sa.Column("synthesis_updated_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_rounds_synthesis_updated_at", "rounds", ["synthesis_updated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_rounds_synthesis_updated_at", table_name="rounds")
+    with op.batch_alter_table("rounds") as batch:
+        batch.drop_column("synthesis_updated_at")
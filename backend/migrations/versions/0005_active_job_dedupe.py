@@ -0,0 +1,54 @@
+"""One active synthesis job per dedupe key
+
+Submissions used to be deduplicated by a per-process lock only, so two
+workers could both queue the same synthesis. A unique partial index over
+queued and running jobs now settles it in the database. Existing
+duplicates are marked failed first, keeping the newest.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+ACTIVE = ("queued", "running")
+
+
+def upgrade():
+    bind = op.get_bind()
+    jobs = sa.table(
+        "synthesis_jobs",
+        sa.column("id", sa.String), sa.column("dedupe_key", sa.String), sa.column("status", sa.String),
+        sa.column("error", sa.Text), sa.column("created_at", sa.DateTime),
+    )
+    rows = bind.execute(
+        sa.select(jobs.c.id, jobs.c.dedupe_key)
+        .where(jobs.c.status.in_(ACTIVE))
+        .order_by(jobs.c.created_at.desc())
+    ).all()
+    seen, duplicates = set(), []
+    for job_id, key in rows:
+        if key in seen:
+            duplicates.append(job_id)
+        seen.add(key)
+    if duplicates:
+        bind.execute(
+            jobs.update().where(jobs.c.id.in_(duplicates))
+            .values(status="failed", error="Superseded by a duplicate submission")
+        )
+
+    op.create_index(
+        "uq_synthesis_jobs_active_dedupe_key", "synthesis_jobs", ["dedupe_key"], unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+        sqlite_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade():
+    op.drop_index("uq_synthesis_jobs_active_dedupe_key", table_name="synthesis_jobs")
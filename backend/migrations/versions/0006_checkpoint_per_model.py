@@ -0,0 +1,64 @@
+"""Key synthesis checkpoints by round and model
+
+A checkpoint made with one model was picked up by incremental syntheses
+with any other. The model is now part of the primary key.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "round_id, model, summary, high_water_mark, response_ids, response_versions, updated_at"
+
+
+def _rebuild(primary_key):
+    # SQLite cannot alter a primary key: copy into a new table instead.
+    op.create_table(
+        "synthesis_checkpoints_new",
+        sa.Column("round_id", sa.Integer(), sa.ForeignKey("rounds.id"), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("high_water_mark", sa.Integer(), nullable=False),
+        sa.Column("response_ids", sa.JSON(), nullable=False),
+        sa.Column("response_versions", sa.JSON(), nullable=True),
+        sa.Column("updated_at", sa.DateTime()),
+        sa.PrimaryKeyConstraint(*primary_key),
+    )
+    op.execute(f"INSERT INTO synthesis_checkpoints_new ({COLUMNS}) SELECT {COLUMNS} FROM synthesis_checkpoints")
+    op.drop_table("synthesis_checkpoints")
+    op.rename_table("synthesis_checkpoints_new", "synthesis_checkpoints")
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        _rebuild(["round_id", "model"])
+        return
+    op.execute(
+        "ALTER TABLE synthesis_checkpoints DROP CONSTRAINT synthesis_checkpoints_pkey, "
+        "ADD CONSTRAINT synthesis_checkpoints_pkey PRIMARY KEY (round_id, model)"
+    )
+
+
+def downgrade():
+    # Keeps the most recently updated checkpoint of each round.
+    op.execute(
+        "DELETE FROM synthesis_checkpoints WHERE EXISTS ("
+        "SELECT 1 FROM synthesis_checkpoints newer "
+        "WHERE newer.round_id = synthesis_checkpoints.round_id "
+        "AND (newer.updated_at > synthesis_checkpoints.updated_at "
+        "OR (newer.updated_at = synthesis_checkpoints.updated_at AND newer.model > synthesis_checkpoints.model)))"
+    )
+    if op.get_bind().dialect.name == "sqlite":
+        _rebuild(["round_id"])
+        return
+    op.execute(
+        "ALTER TABLE synthesis_checkpoints DROP CONSTRAINT synthesis_checkpoints_pkey, "
+        "ADD CONSTRAINT synthesis_checkpoints_pkey PRIMARY KEY (round_id)"
+    )
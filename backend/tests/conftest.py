@@ -0,0 +1,106 @@
+import itertools
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+# consensus reads its configuration at import time, so point it at a
+# throwaway SQLite database (or TEST_DATABASE_URL) before anything imports
+# it. Cheap bcrypt and the fake LLM keep the suite fast and offline.
+_tmp = tempfile.mkdtemp(prefix="consensus-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ["ADMIN_EMAIL"] = "admin@example.com"
+os.environ["ADMIN_PASSWORD"] = "admin-password"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["LLM_PROVIDER"] = "fake"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from consensus.profiling import record_queries  # noqa: E402
+from main import app  # noqa: E402
+
+_emails = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Runs the lifespan, i.e. migrations and the admin account.
+    with TestClient(app) as c:
+        yield c
+
+
+def login(client, email: str, password: str) -> dict:
+    r = client.post("/login", data={"username": email, "password": password})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin(client):
+    return login(client, os.environ["ADMIN_EMAIL"], os.environ["ADMIN_PASSWORD"])
+
+
+@pytest.fixture
+def participant(client):
+    # Registers and logs in a new participant; returns their auth headers.
+    def make(email: str | None = None, password: str = "participant-password"):
+        email = email or f"participant{next(_emails)}@example.com"
+        r = client.post("/register", data={"email": email, "password": password})
+        assert r.status_code == 200, r.text
+        return login(client, email, password)
+
+    return make
+
+
+@pytest.fixture
+def form(client, admin, participant):
+    # Creates a form and has `responses` participants answer its first round;
+    # returns the form id.
+    def make(responses: int = 0, questions=("What should change?", "Why?")):
+        r = client.post("/create_form", headers=admin, json={
+            "title": "Test form",
+            "questions": list(questions),
+            "allow_join": True,
+            "join_code": f"code-{next(_emails)}",
+        })
+        assert r.status_code == 200, r.text
+        form_id = r.json()["id"]
+        for i in range(responses):
+            answers = {f"q{q}": f"Answer {q} from participant {i}" for q in range(1, len(questions) + 1)}
+            r = client.post("/submit", headers=participant(), data={
+                "form_id": form_id,
+                "answers": json.dumps(answers),
+            })
+            assert r.status_code == 200, r.text
+        return form_id
+
+    return make
+
+
+# Query budgets: wrap each call whose cost should not regress.
+#
+#     def test_responses(client, admin, query_budget):
+#         with query_budget(3):
+#             client.get(f"/form/{form_id}/responses", headers=admin)
+#
+# A block fails if it runs more statements than its budget, or (unless
+# allow_repeats=True) the same statement QUERY_PROFILE_REPEAT or more times,
+# which is the shape of an N+1 once the test data has a few rows.
+
+
+@contextmanager
+def assert_max_queries(budget: int, allow_repeats: bool = False, repeat_threshold: int | None = None):
+    with record_queries() as profile:
+        yield profile
+    if profile.count > budget:
+        pytest.fail(f"query budget exceeded: {profile.count} > {budget}\n{profile.report(repeat_threshold)}")
+    if not allow_repeats and profile.repeated(repeat_threshold):
+        pytest.fail(f"N+1 suspected\n{profile.report(repeat_threshold)}")
+
+
+@pytest.fixture
+def query_budget():
+    return assert_max_queries
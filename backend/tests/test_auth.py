@@ -0,0 +1,36 @@
+import json
+
+from consensus.auth import Principal, principal_cache
+from consensus.db import SessionLocal
+from consensus.models import User
+
+
+def test_claiming_an_account_drops_its_cached_principal(client, admin, form):
+    form_id = form()
+    body = json.dumps({"email": "stale@example.org", "answers": {"q1": "a"}}) + "\n"
+    r = client.post(f"/forms/{form_id}/responses/import", headers=admin, content=body.encode())
+    [invite] = r.json()["invites"]
+    with SessionLocal() as db:
+        user_id = db.query(User.id).filter(User.email == "stale@example.org").scalar()
+
+    # As cached by this or any other worker before the change.
+    principal_cache.put(f"id:{user_id}", Principal(id=user_id, email="stale@example.org", is_admin=True))
+
+    r = client.post("/register", data={
+        "email": "stale@example.org", "password": "pw", "invite_token": invite["invite_token"],
+    })
+    assert r.status_code == 200
+    assert principal_cache.get(f"id:{user_id}") is None
+
+
+def test_restart_leaves_an_unchanged_admin_alone(client):
+    from consensus.bootstrap import ensure_admin
+
+    # The client fixture's startup already ran it once.
+    assert ensure_admin() is False
+
+    with SessionLocal() as db:
+        db.query(User).filter(User.email == "admin@example.com").update({"is_admin": False})
+        db.commit()
+    assert ensure_admin() is True
+    assert ensure_admin() is False
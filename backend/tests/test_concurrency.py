@@ -0,0 +1,37 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Requests from several threads share the TestClient's event loop, so they
+# interleave the way they do in a worker: a dependency that blocks the loop,
+# or two connections fighting over SQLite's write lock, shows up as errors.
+
+PARTICIPANTS = 30
+
+
+def test_concurrent_join(client, admin, form):
+    form_id = form()
+    join_code = client.get(f"/forms/{form_id}", headers=admin).json()["join_code"]
+
+    def join(i):
+        email = f"concurrent{i}@example.com"
+        r = client.post("/register", data={"email": email, "password": "pw"})
+        if r.status_code != 200:
+            return f"register: {r.status_code} {r.text}"
+        r = client.post("/login", data={"username": email, "password": "pw"})
+        if r.status_code != 200:
+            return f"login: {r.status_code} {r.text}"
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        r = client.post("/forms/unlock", headers=headers, json={"join_code": join_code})
+        if r.status_code != 200:
+            return f"unlock: {r.status_code} {r.text}"
+        r = client.post("/submit", headers=headers, data={"form_id": form_id, "answers": json.dumps({"q1": email})})
+        if r.status_code != 200:
+            return f"submit: {r.status_code} {r.text}"
+        return None
+
+    with ThreadPoolExecutor(PARTICIPANTS) as pool:
+        errors = [e for e in pool.map(join, range(PARTICIPANTS)) if e]
+
+    assert errors == []
+    responses = client.get(f"/form/{form_id}/responses", headers=admin).json()
+    assert len(responses) == PARTICIPANTS
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, exc
+
+from consensus import db as consensus_db
+from consensus.db import InstrumentedQueuePool, WaitHistogram
+
+
+class _Pool(InstrumentedQueuePool):
+    # Its own histogram rather than the app pool's.
+    wait_histogram = WaitHistogram()
+
+
+@pytest.fixture
+def pool_engine(tmp_path, monkeypatch):
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.db",
+        poolclass=_Pool, pool_size=1, max_overflow=0, pool_timeout=0.2,
+        connect_args={"check_same_thread": False},
+    )
+    monkeypatch.setattr(consensus_db, "engine", engine)
+    yield engine
+    engine.dispose()
+
+
+def test_checkouts_and_waits_are_recorded(client, admin, pool_engine):
+    held = pool_engine.connect()
+    stats = client.get("/admin/db_pool", headers=admin).json()
+    assert (stats["size"], stats["checked_out"], stats["overflow"]) == (1, 1, 0)
+
+    # Nothing comes back in time: a timeout.
+    with pytest.raises(exc.TimeoutError):
+        pool_engine.connect()
+
+    # Released by another thread after 0.1s: a wait.
+    threading.Timer(0.1, held.close).start()
+    with pool_engine.connect():
+        pass
+
+    wait = client.get("/admin/db_pool", headers=admin).json()["wait_seconds"]
+    assert wait["count"] == 3 and wait["timeouts"] == 1
+    # The first checkout was immediate; the others waited 0.2s and ~0.1s.
+    assert wait["buckets"]["0.001"] == 1
+    assert wait["buckets"]["0.05"] == 1
+    assert wait["buckets"]["0.25"] == 3 and wait["buckets"]["+Inf"] == 3
+    assert 0.3 <= wait["sum"] < 1
+
+    text = client.get("/metrics").text
+    assert 'db_pool_checkout_wait_seconds_count{worker=' in text
+    assert "db_pool_checkout_timeouts" in text
+
+
+def test_pool_stats_are_admin_only(client, participant):
+    assert client.get("/admin/db_pool", headers=participant()).status_code == 403
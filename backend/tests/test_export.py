@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from consensus import export
+from consensus.db import SessionLocal
+from consensus.models import Response
+
+
+def _ids(form_id):
+    with SessionLocal() as db:
+        return [r.id for r in db.query(Response.id).filter(Response.form_id == form_id).order_by(Response.id)]
+
+
+def test_export_crosses_pages_and_keeps_undated_rows(client, admin, form, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+    form_id = form(responses=7)
+    ids = _ids(form_id)
+    same_time = datetime(2024, 1, 1)
+    with SessionLocal() as db:
+        # Undated rows (on both sides of a page boundary) and a tie.
+        for i in (0, 1, 4):
+            db.get(Response, ids[i]).created_at = None
+        for i in (2, 3):
+            db.get(Response, ids[i]).created_at = same_time
+        db.commit()
+
+    r = client.get(f"/form/{form_id}/responses/export", headers=admin)
+    assert r.status_code == 200
+    records = [json.loads(line) for line in r.text.splitlines()]
+    assert [rec["id"] for rec in records] == [ids[0], ids[1], ids[4], ids[2], ids[3], ids[5], ids[6]]
+    assert [rec["timestamp"] for rec in records[:3]] == [None] * 3
+
+    r = client.get(f"/form/{form_id}/responses/export?format=csv", headers=admin)
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert sorted(int(row["id"]) for row in rows) == ids
+    assert json.loads(rows[0]["answers"]) == records[0]["answers"]
@@ -0,0 +1,68 @@
+import asyncio
+
+from consensus.db import SessionLocal
+from consensus.models import FormModel, RoundModel
+from consensus.pubsub import InMemoryPubSub
+from consensus.summaries import SummaryStore
+
+FEEDBACK = {"accuracy": "yes", "influence": "no", "furtherThoughts": "", "usability": "fine"}
+
+
+def _recorded(client, admin, email):
+    return [f["summary"] for f in client.get("/all_feedback", headers=admin).json() if f["email"] == email]
+
+
+def test_feedback_records_the_pushed_summary(client, admin, form, participant):
+    first, second = form(responses=1), form(responses=1)
+    for form_id in (first, second):
+        r = client.post(f"/forms/{form_id}/push_summary", headers=admin, json={"summary": f"Summary of {form_id}"})
+        assert r.status_code == 200, r.text
+
+    headers = participant("feedback-latest@example.com")
+    assert client.post("/submit_feedback", headers=headers, json=FEEDBACK).status_code == 200
+    assert _recorded(client, admin, "feedback-latest@example.com") == [f"Summary of {second}"]
+
+    headers = participant("feedback-form@example.com")
+    r = client.post("/submit_feedback", headers=headers, json={**FEEDBACK, "form_id": first})
+    assert r.status_code == 200
+    assert _recorded(client, admin, "feedback-form@example.com") == [f"Summary of {first}"]
+
+    # A worker that never saw either push, or one that just restarted.
+    with SessionLocal() as db:
+        assert SummaryStore(bus=InMemoryPubSub()).latest(db) == f"Summary of {second}"
+
+
+def _set_synthesis(form_id, text):
+    with SessionLocal() as db:
+        active = db.get(FormModel, form_id).active_round_id
+        db.query(RoundModel).filter(RoundModel.id == active).update({"synthesis": text})
+        db.commit()
+
+
+def test_summary_cache_drops_a_form_on_rollover(form):
+    form_id, bus = form(), InMemoryPubSub()
+    store = SummaryStore(bus=bus)
+    _set_synthesis(form_id, "old round")
+    with SessionLocal() as db:
+        assert store.get(db, form_id) == "old round"
+
+    _set_synthesis(form_id, "new round")
+    asyncio.run(bus.publish({"type": "round_rollover", "form_id": form_id, "round_id": None}))
+    with SessionLocal() as db:
+        assert store.get(db, form_id) == "new round"
+
+
+def test_summary_cache_entries_expire(form, monkeypatch):
+    form_id = form()
+    store = SummaryStore(bus=InMemoryPubSub())
+    _set_synthesis(form_id, "before")
+    with SessionLocal() as db:
+        assert store.get(db, form_id) == "before"
+
+    # A push whose event this worker missed.
+    _set_synthesis(form_id, "after")
+    with SessionLocal() as db:
+        assert store.get(db, form_id) == "before"
+        monkeypatch.setenv("SUMMARY_CACHE_TTL", "0")
+        store.set(form_id, None, "before")
+        assert store.get(db, form_id) == "after"
@@ -0,0 +1,48 @@
+import json
+
+
+def _import(client, admin, form_id, records):
+    body = "".join(json.dumps(r) + "\n" for r in records)
+    r = client.post(f"/forms/{form_id}/responses/import", headers=admin, content=body.encode())
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_imported_account_needs_invite(client, admin, form):
+    form_id = form()
+    result = _import(client, admin, form_id, [{"email": "victim@example.org", "answers": {"q1": "secret"}}])
+    assert result["imported"] == 1
+    [invite] = result["invites"]
+    assert invite["email"] == "victim@example.org"
+
+    # Knowing the email is not enough to take the account over.
+    for token in (None, "wrong-token"):
+        data = {"email": "victim@example.org", "password": "attacker"}
+        if token:
+            data["invite_token"] = token
+        assert client.post("/register", data=data).status_code == 400
+    assert client.post("/login", data={"username": "victim@example.org", "password": "attacker"}).status_code == 401
+
+    r = client.post("/register", data={
+        "email": "victim@example.org", "password": "victim", "invite_token": invite["invite_token"],
+    })
+    assert r.status_code == 200, r.text
+    token = client.post("/login", data={"username": "victim@example.org", "password": "victim"}).json()["access_token"]
+    r = client.get(f"/form/{form_id}/my_response", headers={"Authorization": f"Bearer {token}"})
+    assert r.json()["answers"]["q1"] == "secret"
+
+    # The invite is spent once claimed.
+    r = client.post("/register", data={
+        "email": "victim@example.org", "password": "again", "invite_token": invite["invite_token"],
+    })
+    assert r.status_code == 400
+
+
+def test_import_invites_only_new_accounts(client, admin, form, participant):
+    form_id = form()
+    participant("existing@example.org")
+    result = _import(client, admin, form_id, [
+        {"email": "existing@example.org", "answers": {"q1": "a"}},
+        {"email": "new@example.org", "answers": {"q1": "b"}},
+    ])
+    assert [i["email"] for i in result["invites"]] == ["new@example.org"]
@@ -0,0 +1,144 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from consensus.db import SessionLocal
+from consensus.jobs import ABANDONED, JobQueue, MemoryJobStore, SQLJobStore
+from consensus.models import SynthesisJob
+
+
+async def _finish(queue, job_id):
+    while (await queue.get(job_id))["status"] in ("queued", "running"):
+        await asyncio.sleep(0.01)
+    return await queue.get(job_id)
+
+
+def test_workers_share_one_active_job(client):
+    key = uuid.uuid4().hex
+    calls = []
+
+    async def run(progress):
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "summary"
+
+    async def scenario():
+        # Two workers' queues over the same table.
+        workers = [JobQueue(SQLJobStore()), JobQueue(SQLJobStore())]
+        jobs = await asyncio.gather(*(
+            workers[i % 2].submit(key, run, form_id=1, round_id=1) for i in range(6)
+        ))
+        assert len({j["id"] for j in jobs}) == 1
+        return await _finish(workers[0], jobs[0]["id"])
+
+    assert asyncio.run(scenario())["result"] == "summary"
+    assert calls == [1]
+
+
+def test_database_rejects_a_second_active_job(client):
+    store, key = SQLJobStore(), uuid.uuid4().hex
+    fields = dict(dedupe_key=key, form_id=1, round_id=1, status="queued", progress=0.0)
+    assert store.create(id=str(uuid.uuid4()), **fields) is not None
+    assert store.create(id=str(uuid.uuid4()), **fields) is None
+
+
+def test_reaper_fails_abandoned_jobs(client):
+    store, key = SQLJobStore(), uuid.uuid4().hex
+    job = store.create(id=str(uuid.uuid4()), dedupe_key=key, form_id=1, round_id=1,
+                       status="running", progress=0.5)
+    with SessionLocal() as db:
+        db.query(SynthesisJob).filter(SynthesisJob.id == job["id"]).update(
+            {SynthesisJob.updated_at: datetime.utcnow() - timedelta(days=1)}
+        )
+        db.commit()
+
+    async def scenario():
+        queue = JobQueue(store)
+        await queue.start()
+        await queue.stop()
+
+        async def run(progress):
+            return "fresh"
+
+        # The key is free again for a new submission.
+        fresh = await queue.submit(key, run, form_id=1, round_id=1)
+        return await _finish(queue, fresh["id"])
+
+    fresh = asyncio.run(scenario())
+    assert fresh["id"] != job["id"] and fresh["result"] == "fresh"
+    reaped = store.get(job["id"])
+    assert reaped["status"] == "failed" and reaped["error"] == ABANDONED
+
+
+class _SlowStore(MemoryJobStore):
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def update(self, job_id, **fields):
+        if "progress" in fields or "status" in fields:
+            self.writes.append(fields)
+        if "progress" in fields and "status" not in fields:
+            # Slower than the job reports progress.
+            time.sleep(0.02)
+        return super().update(job_id, **fields)
+
+
+def test_progress_writes_are_ordered_and_precede_the_result(client):
+    store = _SlowStore()
+
+    async def run(progress):
+        for i in range(1, 10):
+            progress(i / 10)
+            await asyncio.sleep(0.001)
+        return "done"
+
+    async def scenario():
+        queue = JobQueue(store)
+        job = await queue.submit("key", run, form_id=1, round_id=1)
+        return await _finish(queue, job["id"])
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "succeeded" and job["progress"] == 1.0
+    fractions = [w["progress"] for w in store.writes if "status" not in w]
+    assert fractions == sorted(fractions) and fractions[-1] == 0.9
+    assert store.writes[-1]["status"] == "succeeded"
+
+
+def test_late_cancel_is_not_overwritten_by_success(client):
+    store, key = SQLJobStore(), uuid.uuid4().hex
+
+    async def scenario():
+        queue = JobQueue(store)
+
+        async def run(progress):
+            progress(0.9)
+            await asyncio.sleep(0.01)
+            # Cancelled through another worker after the last progress
+            # report, too late for the cancel watcher to see it.
+            store.update(job["id"], status="cancelled")
+            return "summary"
+
+        job = await queue.submit(key, run, form_id=1, round_id=1)
+        await asyncio.sleep(0.2)
+        return await queue.get(job["id"])
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "cancelled" and job["result"] is None
+
+
+def test_cancel_leaves_a_finished_job_alone(client):
+    store = MemoryJobStore()
+
+    async def scenario():
+        queue = JobQueue(store)
+
+        async def run(progress):
+            return "summary"
+
+        job = await queue.submit("key", run, form_id=1, round_id=1)
+        await _finish(queue, job["id"])
+        return await queue.cancel(job["id"])
+
+    assert asyncio.run(scenario())["status"] == "succeeded"
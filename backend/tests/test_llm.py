@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import pytest
+
+from consensus import llm
+
+PROMPT = "Summarize these responses."
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    monkeypatch.setenv("LLM_RETRY_BASE", "0.001")
+    monkeypatch.setenv("LLM_MAX_RETRIES", "2")
+    monkeypatch.delenv("LLM_FALLBACK_MODELS", raising=False)
+    monkeypatch.delenv("LLM_HEDGE_AFTER", raising=False)
+    provider = llm.FakeProvider(latency={"*": 0.0})
+    monkeypatch.setattr(llm, "_provider", provider)
+    return provider
+
+
+def _served(provider, model):
+    return sum(1 for m, _ in provider.calls if m == model)
+
+
+async def _collect(model):
+    return "".join([delta async for delta in llm.stream(model, PROMPT)])
+
+
+def test_transient_errors_are_retried(fake):
+    fake.fail("m", times=2)
+    assert asyncio.run(llm.complete("m", PROMPT)) == fake.text("m", PROMPT)
+    assert _served(fake, "m") == 3
+
+
+def test_backoff_is_full_jitter(fake, monkeypatch):
+    bounds = []
+    monkeypatch.setattr(llm.random, "uniform", lambda low, high: bounds.append((low, high)) or 0)
+    fake.fail("m", times=2)
+    asyncio.run(llm.complete("m", PROMPT))
+    assert bounds == [(0, 0.001), (0, 0.002)]
+
+
+def test_permanent_errors_are_not_retried(fake):
+    fake.fail("m", retryable=False)
+    with pytest.raises(llm.LLMError):
+        asyncio.run(llm.complete("m", PROMPT))
+    assert _served(fake, "m") == 1
+
+
+def test_falls_back_once_retries_are_exhausted(fake, monkeypatch):
+    monkeypatch.setenv("LLM_FALLBACK_MODELS", "backup")
+    fake.fail("m", times=3)
+    assert asyncio.run(llm.complete("m", PROMPT)) == fake.text("backup", PROMPT)
+    assert (_served(fake, "m"), _served(fake, "backup")) == (3, 1)
+
+
+def test_timeouts_count_as_failures(fake, monkeypatch):
+    monkeypatch.setenv("LLM_FALLBACK_MODELS", "backup")
+    monkeypatch.setenv("LLM_MAX_RETRIES", "0")
+    monkeypatch.setenv("LLM_TIMEOUT_BY_MODEL", "slow=0.05")
+    fake.latency["slow"] = 5
+    assert asyncio.run(llm.complete("slow", PROMPT)) == fake.text("backup", PROMPT)
+
+
+def test_slow_requests_are_hedged(fake, monkeypatch):
+    monkeypatch.setenv("LLM_FALLBACK_MODELS", "backup")
+    monkeypatch.setenv("LLM_HEDGE_AFTER", "0.05")
+    fake.latency["slow"] = 5
+
+    start = time.perf_counter()
+    assert asyncio.run(llm.complete("slow", PROMPT)) == fake.text("backup", PROMPT)
+    assert time.perf_counter() - start < 1
+
+
+def test_hedge_loses_to_a_primary_that_answers_first(fake, monkeypatch):
+    monkeypatch.setenv("LLM_FALLBACK_MODELS", "backup")
+    monkeypatch.setenv("LLM_HEDGE_AFTER", "0.02")
+    fake.latency.update({"m": 0.05, "backup": 5})
+    assert asyncio.run(llm.complete("m", PROMPT)) == fake.text("m", PROMPT)
+
+
+def test_stream_falls_back_before_the_first_token(fake, monkeypatch):
+    monkeypatch.setenv("LLM_FALLBACK_MODELS", "backup")
+    fake.fail("m", times=3)
+    assert asyncio.run(_collect("m")) == fake.text("backup", PROMPT)
+
+
+def test_stream_is_hedged(fake, monkeypatch):
+    monkeypatch.setenv("LLM_FALLBACK_MODELS", "backup")
+    monkeypatch.setenv("LLM_HEDGE_AFTER", "0.05")
+    fake.latency["slow"] = 5
+    assert asyncio.run(_collect("slow")) == fake.text("backup", PROMPT)
+
+
+def test_stalled_stream_times_out_between_tokens(fake, monkeypatch):
+    monkeypatch.setenv("LLM_TIMEOUT", "0.05")
+    fake.chunk_delay = 1
+
+    async def read():
+        seen = []
+        with pytest.raises(TimeoutError):
+            async for delta in llm.stream("m", PROMPT):
+                seen.append(delta)
+        return seen
+
+    # The first token went out; past it there is no retrying.
+    assert len(asyncio.run(read())) == 1
+
+
+def test_hedged_stream_times_out_between_tokens(fake, monkeypatch):
+    monkeypatch.setenv("LLM_FALLBACK_MODELS", "backup")
+    monkeypatch.setenv("LLM_HEDGE_AFTER", "0.01")
+    monkeypatch.setenv("LLM_TIMEOUT", "0.05")
+    fake.latency["m"] = 1
+    fake.chunk_delay = 1
+
+    async def read():
+        seen = []
+        with pytest.raises(TimeoutError):
+            async for delta in llm.stream("m", PROMPT):
+                seen.append(delta)
+        return seen
+
+    assert asyncio.run(read()) == [fake.text("backup", PROMPT).split(" ")[0] + " "]
@@ -0,0 +1,71 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+import uvicorn
+
+from benchmarks.fake_openrouter import make_app
+from consensus import llm
+
+
+@pytest.fixture(scope="module")
+def openrouter_url():
+    # The benchmarks' stand-in for OpenRouter, served over a real socket so
+    # the provider streams through httpx as it does in production.
+    app = make_app(latency=0, chunk_delay=0.005, latency_by_model={"slow": 1})
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        threading.Event().wait(0.01)
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}/v1"
+    server.should_exit = True
+    thread.join()
+
+
+class _RecordingProvider(llm.OpenRouterProvider):
+    # Notes which tasks iterate each stream.
+    streams: list[set] = []
+
+    async def stream(self, model, prompt):
+        tasks = set()
+        self.streams.append(tasks)
+        async for delta in super().stream(model, prompt):
+            tasks.add(asyncio.current_task())
+            yield delta
+
+
+@pytest.fixture
+def openrouter(openrouter_url, monkeypatch):
+    monkeypatch.setenv("OPENROUTER_BASE_URL", openrouter_url)
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    monkeypatch.setenv("LLM_FALLBACK_MODELS", "backup")
+    monkeypatch.setenv("LLM_HEDGE_AFTER", "0.05")
+    monkeypatch.setattr(llm, "_provider", None)
+    monkeypatch.setattr(llm, "PROVIDERS", {**llm.PROVIDERS, "openrouter": _RecordingProvider})
+    monkeypatch.setenv("LLM_PROVIDER", "openrouter")
+    _RecordingProvider.streams = []
+    return _RecordingProvider
+
+
+async def _collect(model):
+    try:
+        return "".join([delta async for delta in llm.stream(model, "Summarize.")])
+    finally:
+        await llm.aclose()
+
+
+def test_hedged_stream_over_http(openrouter):
+    assert asyncio.run(_collect("slow")).startswith("Synthesis by backup")
+    # An async generator must stay in the task that started it.
+    assert [len(tasks) for tasks in openrouter.streams] == [0, 1]
+
+
+def test_primary_stream_wins_over_http(openrouter, monkeypatch):
+    monkeypatch.setenv("LLM_HEDGE_AFTER", "0.001")
+    monkeypatch.setenv("LLM_FALLBACK_MODELS", "slow")
+    assert asyncio.run(_collect("m")).startswith("Synthesis by m")
+    assert [len(tasks) for tasks in openrouter.streams] == [1, 0]
@@ -0,0 +1,43 @@
+from consensus import metrics
+
+
+def _form_labels():
+    return {form_id for _, form_id in metrics.form_requests._values}
+
+
+def test_form_label_comes_only_from_accepted_routed_requests(client, admin, form):
+    form_id = form()
+    assert client.get(f"/forms/{form_id}", headers=admin).status_code == 200
+    assert str(form_id) in _form_labels()
+
+    before = _form_labels()
+    rejected = [
+        client.get("/forms/424242"),  # unauthenticated
+        client.get("/forms/424243", headers=admin),  # no such form
+        client.get("/forms/not-a-number", headers=admin),  # fails validation
+        client.get("/nowhere?form_id=424244"),  # unmatched
+        client.get("/forms?form_id=424245", headers=admin),  # route takes no form_id
+    ]
+    assert [r.status_code for r in rejected] == [401, 404, 422, 404, 200]
+    assert _form_labels() == before
+
+
+def test_requests_are_counted_by_route_template(client, admin, form):
+    form_id = form()
+    key = ("GET", "/forms/{form_id}", "200")
+    before = metrics.http_requests._values.get(key, 0)
+    client.get(f"/forms/{form_id}", headers=admin)
+    assert metrics.http_requests._values[key] == before + 1
+
+    client.get("/nowhere")
+    assert metrics.http_requests._values[("GET", "unmatched", "404")] >= 1
+
+
+def test_tagged_form_is_labelled(client, participant, form):
+    form_id = form()
+    headers = participant()
+    key = ("/submit", str(form_id))
+    before = metrics.form_requests._values.get(key, 0)
+    r = client.post("/submit", headers=headers, data={"form_id": form_id, "answers": '{"q1": "a"}'})
+    assert r.status_code == 200, r.text
+    assert metrics.form_requests._values[key] == before + 1
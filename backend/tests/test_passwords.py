@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+from consensus import passwords
+from consensus.db import SessionLocal
+from consensus.models import User
+
+
+def test_login_rehashes_at_the_configured_cost(client, monkeypatch):
+    # Made when BCRYPT_ROUNDS was 4; it is 5 now.
+    old_hash = passwords.make_context(4).hash("pw")
+    monkeypatch.setattr(passwords, "pwd_context", passwords.make_context(5))
+    with SessionLocal() as db:
+        db.add(User(email="rehash@example.org", hashed_password=old_hash))
+        db.commit()
+
+    threads = []
+    verify = passwords.verify_and_update
+
+    def recording(plain, hashed):
+        threads.append(threading.current_thread())
+        return verify(plain, hashed)
+
+    monkeypatch.setattr(passwords, "verify_and_update", recording)
+
+    r = client.post("/login", data={"username": "rehash@example.org", "password": "pw"})
+    assert r.status_code == 200
+    with SessionLocal() as db:
+        new_hash = db.query(User.hashed_password).filter(User.email == "rehash@example.org").scalar()
+    assert old_hash.startswith("$2b$04$") and new_hash.startswith("$2b$05$")
+    assert passwords.pwd_context.verify("pw", new_hash)
+
+    # PASSWORD_HASH_WORKERS=0: verified on a threadpool thread, not the
+    # event loop's (the test client runs the app in a thread of its own).
+    assert passwords._get_pool() is None
+    assert threads and threads[0].name.startswith("AnyIO worker thread")
+
+    # Already at the configured cost: left alone.
+    assert client.post("/login", data={"username": "rehash@example.org", "password": "pw"}).status_code == 200
+    with SessionLocal() as db:
+        assert db.query(User.hashed_password).filter(User.email == "rehash@example.org").scalar() == new_hash
+
+
+def test_hashing_in_the_process_pool(monkeypatch):
+    monkeypatch.setenv("PASSWORD_HASH_WORKERS", "1")
+    monkeypatch.setattr(passwords, "_pool", None)
+    try:
+        hashed = asyncio.run(passwords.hash_password_async("pw"))
+        assert passwords._pool is not None
+        assert asyncio.run(passwords.verify_and_update_async("pw", hashed)) == (True, None)
+    finally:
+        passwords.shutdown_pool()
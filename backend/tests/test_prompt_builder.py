@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+from consensus import prompt_builder
+from consensus.prompt_builder import CompactResponses, estimate_tokens
+
+QUESTIONS = ["What should change?"]
+LONG = (
+    "The committee should publish its meeting minutes within a week and invite "
+    "students to comment on each proposal before any vote takes place"
+)
+
+
+def _responses(*answers):
+    return [SimpleNamespace(answers={"q1": a}) for a in answers]
+
+
+def test_near_duplicates_collapse_and_distinct_answers_survive():
+    distinct = "Funding for the library should go up, and opening hours should be longer in exam season"
+    compact = CompactResponses(QUESTIONS, _responses(
+        LONG,
+        LONG + " please",
+        LONG.upper() + "!",
+        distinct,
+    ))
+    blocks = compact.blocks()
+    assert len(blocks) == 2
+    assert f"A (3 participants): {LONG}" in blocks[0]
+    assert distinct in blocks[1]
+    assert compact.report(blocks)["exact_duplicates"] == 1
+    assert compact.report(blocks)["near_duplicates"] == 1
+
+
+def test_near_duplicates_stay_apart_at_threshold_one(monkeypatch):
+    monkeypatch.setenv("SYNTHESIS_DEDUP_THRESHOLD", "1")
+    compact = CompactResponses(QUESTIONS, _responses(LONG, LONG + " please"))
+    assert len(compact.blocks()) == 2
+
+
+def test_blank_answers_and_empty_responses_are_dropped():
+    compact = CompactResponses(QUESTIONS + ["Why?"], [
+        SimpleNamespace(answers={"q1": "n/a", "q2": "  "}),
+        SimpleNamespace(answers={"q1": "More seating", "q2": "-"}),
+        SimpleNamespace(answers=None),
+    ])
+    blocks = compact.blocks()
+    assert blocks == ["Response 1:\n  - Q: What should change?\n    A: More seating"]
+    report = compact.report(blocks)
+    assert report["blank"] == 5 and report["responses_sent"] == 1
+
+
+def test_long_answers_are_truncated(monkeypatch):
+    monkeypatch.setenv("SYNTHESIS_MAX_ANSWER_TOKENS", "10")
+    compact = CompactResponses(QUESTIONS, _responses(LONG))
+    [block] = compact.blocks()
+    assert block.endswith("… [truncated]")
+    answer = block.split("A: ", 1)[1].removesuffix(" … [truncated]")
+    assert len(answer) <= 10 * prompt_builder.CHARS_PER_TOKEN and LONG.startswith(answer)
+    assert compact.report([block])["truncated"] == 1
+
+
+def test_blocks_within_fits_the_budget():
+    answers = [f"Participant {i} thinks " + " ".join(f"point{i}-{n}" for n in range(300)) for i in range(6)]
+    compact = CompactResponses(QUESTIONS, _responses(*answers))
+    full = sum(estimate_tokens(b) for b in compact.blocks())
+
+    budget = full // 3
+    blocks = compact.blocks_within(budget)
+    assert len(blocks) == 6
+    assert sum(estimate_tokens(b) for b in blocks) <= budget
+    # The largest cap that fits: one token more would not.
+    cap = len(blocks[0].split("A: ", 1)[1]) // prompt_builder.CHARS_PER_TOKEN
+    assert sum(estimate_tokens(b) for b in compact.blocks(cap + 2)) > budget
+
+    # Never below the minimum per answer, even if that overshoots.
+    blocks = compact.blocks_within(1)
+    assert all("… [truncated]" in b for b in blocks)
+    assert blocks == compact.blocks(prompt_builder.MIN_ANSWER_TOKENS)
@@ -0,0 +1,61 @@
+# Budgets are per request and independent of the number of rows: each test
+# has enough responses that a per-row query would show up as a repeat.
+
+RESPONSES = 4
+
+
+def _warm(client, admin):
+    # The admin principal is cached after the first request; budgets below
+    # are for the steady state.
+    client.get("/me", headers=admin)
+
+
+def test_all_feedback(client, admin, participant, form, query_budget):
+    form_id = form(responses=1)
+    for _ in range(RESPONSES):
+        r = client.post("/submit_feedback", headers=participant(), json={
+            "accuracy": "high", "influence": "some", "furtherThoughts": "", "usability": "good",
+            "form_id": form_id,
+        })
+        assert r.status_code == 200, r.text
+    _warm(client, admin)
+
+    with query_budget(1):
+        r = client.get("/all_feedback", headers=admin)
+    assert r.status_code == 200
+    assert len(r.json()) >= RESPONSES
+
+
+def test_form_responses(client, admin, form, query_budget):
+    form_id = form(responses=RESPONSES)
+    _warm(client, admin)
+
+    with query_budget(2):
+        r = client.get(f"/form/{form_id}/responses", headers=admin)
+    assert len(r.json()) == RESPONSES
+
+    with query_budget(1):
+        r = client.get(f"/form/{form_id}/responses", params={"all_rounds": True}, headers=admin)
+    assert len(r.json()) == RESPONSES
+
+
+def test_forms(client, admin, form, query_budget):
+    for _ in range(3):
+        form(responses=1)
+    _warm(client, admin)
+
+    with query_budget(1):
+        r = client.get("/forms", headers=admin)
+    assert len(r.json()) >= 3
+
+
+def test_rounds_with_responses(client, admin, form, participant, query_budget):
+    form_id = form(responses=RESPONSES)
+    assert client.post(f"/forms/{form_id}/next_round", headers=admin).status_code == 200
+    client.post("/submit", headers=participant(), data={"form_id": form_id, "answers": '{"q1": "later"}'})
+    _warm(client, admin)
+
+    with query_budget(2):
+        r = client.get(f"/forms/{form_id}/rounds_with_responses", headers=admin)
+    rounds = r.json()
+    assert [len(x["responses"]) for x in rounds] == [RESPONSES, 1]
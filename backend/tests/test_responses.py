@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from consensus import responses
+from consensus.db import SessionLocal
+from consensus.models import ArchivedResponse, FormModel, Response
+
+
+def _submit(client, headers, form_id, answer):
+    r = client.post("/submit", headers=headers, data={"form_id": form_id, "answers": json.dumps({"q1": answer})})
+    assert r.status_code == 200, r.text
+
+
+@pytest.mark.parametrize("on_conflict", [True, False], ids=["on_conflict", "update_then_insert"])
+def test_resubmission_updates_the_row_in_place(client, form, participant, monkeypatch, on_conflict):
+    if not on_conflict:
+        monkeypatch.setattr(responses, "dialect_insert", lambda db: None)
+    form_id = form()
+    headers = participant()
+
+    _submit(client, headers, form_id, "first")
+    with SessionLocal() as db:
+        [first] = db.query(Response).filter(Response.form_id == form_id).all()
+
+    _submit(client, headers, form_id, "second")
+    with SessionLocal() as db:
+        [row] = db.query(Response).filter(Response.form_id == form_id).all()
+        assert (row.id, row.round_id, row.user_id) == (first.id, first.round_id, first.user_id)
+        assert row.answers == {"q1": "second"} and row.created_at >= first.created_at
+        assert db.get(FormModel, form_id).participant_count == 1
+        # Every submission is still archived.
+        assert db.query(ArchivedResponse).filter(ArchivedResponse.form_id == form_id).count() == 2
+
+    _submit(client, participant(), form_id, "someone else")
+    with SessionLocal() as db:
+        assert db.query(Response).filter(Response.form_id == form_id).count() == 2
+        assert db.get(FormModel, form_id).participant_count == 2
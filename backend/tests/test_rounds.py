@@ -0,0 +1,33 @@
+import json
+
+from consensus.db import SessionLocal
+from consensus.rounds import active_rounds
+
+
+def test_unknown_forms_are_not_cached(client):
+    with SessionLocal() as db:
+        assert active_rounds.get_id(db, 10_000_000) is None
+    assert active_rounds._cached(10_000_000) == (False, None)
+
+
+def test_deleting_a_form_drops_its_active_round(client, admin, form, participant):
+    form_id = form(responses=1)
+    assert active_rounds._cached(form_id)[0]
+
+    assert client.delete(f"/forms/{form_id}", headers=admin).status_code == 200
+    assert active_rounds._cached(form_id) == (False, None)
+    r = client.post("/submit", headers=participant(), data={"form_id": form_id, "answers": json.dumps({"q1": "x"})})
+    assert r.status_code == 400
+
+
+def test_rounds_with_responses_is_well_formed_json(client, admin, form):
+    form_id = form(responses=1)
+    summary = 'A "quoted" {summary}, with ] and , in it'
+    assert client.post(f"/forms/{form_id}/push_summary", headers=admin, json={"summary": summary}).status_code == 200
+    assert client.post(f"/forms/{form_id}/next_round", headers=admin).status_code == 200
+
+    rounds = client.get(f"/forms/{form_id}/rounds_with_responses", headers=admin).json()
+    assert [sorted(r) for r in rounds] == [["id", "is_active", "responses", "round_number", "synthesis"]] * 2
+    assert [(r["round_number"], r["is_active"], len(r["responses"])) for r in rounds] == [(1, False, 1), (2, True, 0)]
+    assert rounds[0]["synthesis"] == summary
+    assert sorted(rounds[0]["responses"][0]) == ["answers", "email", "timestamp"]
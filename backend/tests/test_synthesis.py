@@ -0,0 +1,65 @@
+import asyncio
+
+from consensus import llm, synthesis
+from consensus.prompt_builder import CHARS_PER_TOKEN
+
+
+def _generate(client, admin, form_id, model, **options):
+    r = client.post(f"/forms/{form_id}/generate_summary", headers=admin, json={"model": model, **options})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_incremental_results_and_checkpoints_stay_separate(client, admin, form, participant):
+    form_id = form(responses=2)
+    provider = llm.get_provider()
+
+    first = _generate(client, admin, form_id, "model-a")
+    client.post("/submit", headers=participant(), data={"form_id": form_id, "answers": '{"q1": "late", "q2": "why"}'})
+
+    # Updates model-a's checkpoint with the new response.
+    update = _generate(client, admin, form_id, "model-a", incremental=True)
+    assert not update["cached"]
+    assert first["summary"] in provider.calls[-1][1]
+
+    # Same responses, but a full synthesis is not the incremental update.
+    full = _generate(client, admin, form_id, "model-a")
+    assert not full["cached"]
+    assert full["summary"] != update["summary"]
+
+    # No checkpoint for model-b: it synthesizes from scratch.
+    _generate(client, admin, form_id, "model-b", incremental=True)
+    model, prompt = provider.calls[-1]
+    assert model == "model-b" and "model-a" not in prompt
+
+
+def _block(tokens: int) -> str:
+    # estimate_tokens counts CHARS_PER_TOKEN characters, plus one.
+    return "x" * ((tokens - 1) * CHARS_PER_TOKEN)
+
+
+def test_batches_break_at_the_token_budget():
+    ten = _block(10)
+    assert [len(b) for b in synthesis.batch_by_tokens([ten] * 6, 30)] == [3, 3]
+    assert [len(b) for b in synthesis.batch_by_tokens([ten] * 6, 29)] == [2, 2, 2]
+    # Too large for any batch: on its own, not split.
+    big = _block(50)
+    assert synthesis.batch_by_tokens([ten, big, ten], 30) == [[ten], [big], [ten]]
+
+
+def test_map_reduce_maps_each_batch_then_merges(monkeypatch):
+    provider = llm.FakeProvider(latency={"*": 0})
+    monkeypatch.setattr(llm, "_provider", provider)
+    blocks = [f"Response {i}:\n  A: " + _block(200) for i in range(1, 7)]
+    questions = ["What should change?"]
+
+    prompt = asyncio.run(synthesis.map_reduce_prompt("m", questions, blocks, batch_tokens=450, concurrency=2))
+
+    map_prompts = [p for _, p in provider.calls]
+    assert len(map_prompts) == 3
+    for i, p in enumerate(map_prompts, 1):
+        assert f"batch {i} of 3" in p
+        assert f"Response {2 * i - 1}:" in p and f"Response {2 * i}:" in p
+    # The final reduce prompt is returned, not sent, with every partial in it.
+    for p in map_prompts:
+        assert provider.text("m", p) in prompt
@@ -0,0 +1,68 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from consensus import llm
+from consensus.db import SessionLocal
+from consensus.models import SynthesisCacheEntry
+from consensus.synthesis_cache import SynthesisCache
+
+
+def _key():
+    return uuid.uuid4().hex
+
+
+def test_memory_tier_evicts_least_recently_used(client, monkeypatch):
+    monkeypatch.setenv("SYNTHESIS_CACHE_SIZE", "2")
+    cache = SynthesisCache()
+    a, b, c = _key(), _key(), _key()
+    cache.put(a, "m", "A")
+    cache.put(b, "m", "B")
+    assert cache.get(a) == "A"
+    cache.put(c, "m", "C")
+    assert list(cache._entries) == [a, c]
+
+
+def test_memory_miss_reads_through_the_database(client):
+    key = _key()
+    SynthesisCache().put(key, "m", "stored elsewhere")
+
+    # Another worker, or this one after a restart.
+    cache = SynthesisCache()
+    assert cache.get(key) == "stored elsewhere"
+    assert key in cache._entries
+
+
+def test_expired_entries_are_misses(client):
+    key = _key()
+    SynthesisCache().put(key, "m", "old")
+    with SessionLocal() as db:
+        db.get(SynthesisCacheEntry, key).created_at = datetime.utcnow() - timedelta(days=2)
+        db.commit()
+
+    cache = SynthesisCache()
+    assert cache.get(key) is None
+    with SessionLocal() as db:
+        assert db.get(SynthesisCacheEntry, key) is None
+
+    # Expired in memory, and not in the database either.
+    unknown = _key()
+    cache._remember(unknown, time.time() - 2 * 86400, "old")
+    assert cache.get(unknown) is None
+    assert unknown not in cache._entries
+
+
+def test_force_skips_both_tiers(client, admin, form):
+    form_id = form(responses=2)
+    provider = llm.get_provider()
+
+    def generate(**options):
+        r = client.post(f"/forms/{form_id}/generate_summary", headers=admin, json={"model": "m", **options})
+        assert r.status_code == 200, r.text
+        return r.json()["cached"]
+
+    assert generate() is False
+    assert generate() is True
+    calls = len(provider.calls)
+    assert generate(force=True) is False
+    assert len(provider.calls) == calls + 1
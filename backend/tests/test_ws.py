@@ -0,0 +1,133 @@
+import asyncio
+
+from consensus import metrics, ws
+from consensus.pubsub import InMemoryPubSub
+
+
+class FakeSocket:
+    def __init__(self, send_delay: float = 0):
+        self.send_delay = send_delay
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        await asyncio.sleep(self.send_delay)
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def _dropped():
+    return metrics.ws_dropped._values.get((), 0)
+
+
+def test_pubsub_isolates_failing_handlers():
+    bus, seen = InMemoryPubSub(), []
+
+    async def broken(event):
+        raise RuntimeError("boom")
+
+    async def record(event):
+        seen.append(event["type"])
+
+    bus.subscribe(broken)
+    bus.subscribe(record)
+    asyncio.run(bus.publish({"type": "ping"}))
+    assert seen == ["ping"]
+
+
+def test_summaries_fan_out_by_topic():
+    async def scenario():
+        manager = ws.ConnectionManager(bus=InMemoryPubSub())
+        sockets = {
+            "firehose": FakeSocket(),
+            "form": FakeSocket(),
+            "round": FakeSocket(),
+            "other_round": FakeSocket(),
+            "other_form": FakeSocket(),
+        }
+        await manager.connect(sockets["firehose"])
+        await manager.connect(sockets["form"], form_id=1)
+        await manager.connect(sockets["round"], form_id=1, round_id=10)
+        await manager.connect(sockets["other_round"], form_id=1, round_id=11)
+        await manager.connect(sockets["other_form"], form_id=2)
+
+        await manager.broadcast_summary("hello", form_id=1, round_id=10)
+        await asyncio.sleep(0.01)
+        return {name: [m["summary"] for m in s.sent] for name, s in sockets.items()}
+
+    assert asyncio.run(scenario()) == {
+        "firehose": ["hello"],
+        "form": ["hello"],
+        "round": ["hello"],
+        "other_round": [],
+        "other_form": [],
+    }
+
+
+def test_consumer_with_full_outbox_is_dropped(monkeypatch):
+    monkeypatch.setenv("WS_QUEUE_SIZE", "2")
+
+    async def scenario():
+        manager = ws.ConnectionManager(bus=InMemoryPubSub())
+        slow, fast = FakeSocket(send_delay=5), FakeSocket()
+        await manager.connect(slow, form_id=1)
+        await manager.connect(fast, form_id=1)
+
+        # The slow socket holds one message in send and two in its outbox,
+        # so the fourth overflows it; the fast one keeps up throughout.
+        for i in range(4):
+            manager.publish({"n": i}, form_id=1)
+            await asyncio.sleep(0.01)
+        return manager, slow, fast
+
+    before = _dropped()
+    manager, slow, fast = asyncio.run(scenario())
+    assert slow.closed_with == 1013
+    assert slow not in manager.active_connections
+    assert [m["n"] for m in fast.sent] == [0, 1, 2, 3]
+    assert fast in manager.active_connections
+    assert _dropped() == before + 1
+
+
+def test_stalled_send_is_dropped(monkeypatch):
+    monkeypatch.setenv("WS_SEND_TIMEOUT", "0.05")
+
+    async def scenario():
+        manager = ws.ConnectionManager(bus=InMemoryPubSub())
+        stalled = FakeSocket(send_delay=5)
+        await manager.connect(stalled)
+        manager.publish({"type": "summary_updated"})
+        await asyncio.sleep(0.2)
+        return manager, stalled
+
+    manager, stalled = asyncio.run(scenario())
+    assert stalled.closed_with == 1013
+    assert not manager.active_connections
+
+
+def test_oversized_summary_is_read_back_from_the_round(monkeypatch):
+    monkeypatch.setattr(ws, "_round_synthesis", lambda round_id: f"stored for {round_id}")
+
+    async def scenario():
+        bus, events = InMemoryPubSub(), []
+        bus.max_payload = 200
+
+        async def record(event):
+            events.append(event)
+
+        bus.subscribe(record)
+        manager = ws.ConnectionManager(bus=bus)
+        socket = FakeSocket()
+        await manager.connect(socket, form_id=1)
+        await manager.broadcast_summary("x" * 500, form_id=1, round_id=7)
+        await asyncio.sleep(0.01)
+        return events, socket
+
+    events, socket = asyncio.run(scenario())
+    assert events[0]["summary"] is None
+    assert socket.sent[0]["summary"] == "stored for 7"
@@ -216,7 +216,7 @@ export default function FormPage() {
 
 
 
-    navigate('/waiting')
+    navigate('/waiting', { state: { formId: Number(id) } })
 
   }
 
@@ -1,10 +1,13 @@
 import { useState } from 'react';
 import { useAuth } from './AuthContext';
-import { Link, Navigate } from 'react-router-dom';
+import { Link, Navigate, useSearchParams } from 'react-router-dom';
 import { API_BASE_URL } from './config';
 
 export default function Register() {
-  const [email, setEmail] = useState('');
+  // Participants imported by an admin arrive with ?email=...&invite=...
+  const [searchParams] = useSearchParams();
+  const invite = searchParams.get('invite');
+  const [email, setEmail] = useState(searchParams.get('email') ?? '');
   const [password, setPassword] = useState('');
   const [error, setError] = useState('');
   const { login, token, isLoading } = useAuth();
@@ -19,7 +22,7 @@ export default function Register() {
       const reg = await fetch(`${API_BASE_URL}/register`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
-        body: new URLSearchParams({ email, password })
+        body: new URLSearchParams(invite ? { email, password, invite_token: invite } : { email, password })
       });
 
       if (!reg.ok) {
@@ -1,5 +1,5 @@
 import { useEffect, useRef, useState } from 'react'
-import { useNavigate } from 'react-router-dom'
+import { useLocation, useNavigate } from 'react-router-dom'
 import { API_BASE_URL } from './config'
 
 export default function ResultPage() {
@@ -13,6 +13,7 @@ export default function ResultPage() {
   })
   const hadSummary = useRef(false)
   const navigate = useNavigate()
+  const formId = (useLocation().state as { formId?: number } | null)?.formId
 
   useEffect(() => {
     const token = localStorage.getItem('access_token')
@@ -43,7 +44,7 @@ export default function ResultPage() {
         }).then(r => r.json())
 
         if (!summary.summary?.trim()) {
-          navigate('/waiting', { replace: true })
+          navigate('/waiting', { replace: true, state: { formId } })
           return
         }
 
@@ -51,26 +52,27 @@ export default function ResultPage() {
         hadSummary.current = true
       } catch (err) {
         console.error('ResultPage load error:', err)
-        navigate('/waiting', { replace: true })
+        navigate('/waiting', { replace: true, state: { formId } })
       }
     }
 
     load()
-  }, [navigate])
+  }, [navigate, formId])
 
   useEffect(() => {
+    const query = formId != null ? `?form_id=${formId}` : ''
     const ws = new WebSocket(
-      `${window.location.protocol === 'https:' ? 'wss' : 'ws'}://${new URL(API_BASE_URL).host}/ws`
+      `${window.location.protocol === 'https:' ? 'wss' : 'ws'}://${new URL(API_BASE_URL).host}/ws${query}`
     )
 
 
     ws.onmessage = (e) => {
       try {
         const msg = JSON.parse(e.data)
-        if (msg.type === 'summary_updated') {
+        if (msg.type === 'summary_updated' && (formId == null || msg.form_id === formId)) {
           const newHtml = (msg.html ?? msg.summary ?? '').trim()
           if (!newHtml && hadSummary.current) {
-            navigate('/waiting', { replace: true })
+            navigate('/waiting', { replace: true, state: { formId } })
           } else if (newHtml) {
             hadSummary.current = true
             setHtml(newHtml)
@@ -82,7 +84,7 @@ export default function ResultPage() {
     }
 
     return () => ws.close()
-  }, [navigate])
+  }, [navigate, formId])
 
   function logout() {
     localStorage.clear()
@@ -104,7 +106,7 @@ export default function ResultPage() {
     fetch(`${API_BASE_URL}/submit_feedback`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
-      body: JSON.stringify(responses)
+      body: JSON.stringify({ ...responses, form_id: formId ?? null })
     }).then(() => navigate('/thank-you'))
   }
 
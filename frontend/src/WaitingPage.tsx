@@ -1,15 +1,20 @@
 import { useEffect, useState } from 'react'
-import { useNavigate } from 'react-router-dom'
+import { useLocation, useNavigate } from 'react-router-dom'
 import { API_BASE_URL } from './config'
 
 export default function WaitingPage() {
   const navigate = useNavigate()
+  // The form just submitted to; only its summaries concern this page
+  const formId = (useLocation().state as { formId?: number } | null)?.formId
   const [email, setEmail] = useState('')
 
   useEffect(() => {
     const token = localStorage.getItem('access_token')
     if (!token) return
 
+    let socket: WebSocket | null = null
+    let closed = false
+
     const fetchMeAndCheckSummary = async () => {
       try {
         // get user info
@@ -24,10 +29,14 @@ export default function WaitingPage() {
         console.error('[WaitingPage] ❌ Fetch error:', err)
       }
 
+      if (closed) return
+
       // only open websocket if still waiting
-      const wsUrl = `${window.location.protocol === 'https:' ? 'wss' : 'ws'}://${new URL(API_BASE_URL).host}/ws`
+      const query = formId != null ? `?form_id=${formId}` : ''
+      const wsUrl = `${window.location.protocol === 'https:' ? 'wss' : 'ws'}://${new URL(API_BASE_URL).host}/ws${query}`
 
       const ws = new WebSocket(wsUrl)
+      socket = ws
 
       ws.onopen = () => {
         console.log('[WaitingPage] ✅ WebSocket connected')
@@ -36,9 +45,9 @@ export default function WaitingPage() {
       ws.onmessage = (e) => {
         try {
           const msg = JSON.parse(e.data)
-          if (msg.type === 'summary_updated') {
+          if (msg.type === 'summary_updated' && (formId == null || msg.form_id === formId)) {
             console.log('[WaitingPage] 🟢 Summary update received — navigating to /result')
-            navigate('/result', { replace: true })
+            navigate('/result', { replace: true, state: { formId } })
           }
         } catch (err) {
           console.error('[WaitingPage] ❌ Failed to parse message:', err)
@@ -52,14 +61,15 @@ export default function WaitingPage() {
       ws.onclose = () => {
         console.log('[WaitingPage] 🔌 WebSocket closed')
       }
-
-      return () => {
-        ws.close()
-      }
     }
 
     fetchMeAndCheckSummary()
-  }, [navigate])
+
+    return () => {
+      closed = true
+      socket?.close()
+    }
+  }, [navigate, formId])
 
   function logout() {
     localStorage.clear()